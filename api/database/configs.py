@@ -13,3 +13,26 @@ POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", 10))
 MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", 20))
 POOL_TIMEOUT = int(os.getenv("DATABASE_POOL_TIMEOUT", 30))
 POOL_RECYCLE = int(os.getenv("DATABASE_POOL_RECYCLE", 3600))
+POOL_WAIT_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+DATABASE_ECHO = os.getenv("DATABASE_ECHO", "false").lower() in ("1", "true", "yes")
+
+# Read replica; reads stay on the primary when REPLICA_DATABASE_HOST is unset.
+REPLICA_DATABASE_HOST = os.getenv("REPLICA_DATABASE_HOST")
+REPLICA_DATABASE_PORT = os.getenv("REPLICA_DATABASE_PORT", DATABASE_PORT)
+REPLICA_DATABASE_USERNAME = os.getenv("REPLICA_DATABASE_USERNAME", DATABASE_USERNAME)
+REPLICA_DATABASE_PASSWORD = os.getenv("REPLICA_DATABASE_PASSWORD", DATABASE_PASSWORD)
+REPLICA_DATABASE_NAME = os.getenv("REPLICA_DATABASE_NAME", DATABASE_NAME)
+REPLICA_POOL_SIZE = int(os.getenv("REPLICA_DATABASE_POOL_SIZE", POOL_SIZE))
+REPLICA_MAX_OVERFLOW = int(os.getenv("REPLICA_DATABASE_MAX_OVERFLOW", MAX_OVERFLOW))
+REPLICA_MAX_LAG_IN_SECONDS = float(os.getenv("REPLICA_MAX_LAG_IN_SECONDS", 5))
+REPLICA_LAG_CHECK_INTERVAL_IN_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL_IN_SECONDS", 2))
+READ_YOUR_WRITES_WINDOW_IN_SECONDS = int(os.getenv("READ_YOUR_WRITES_WINDOW_IN_SECONDS", 10))
+
+# Soft-deleted rows are hard-deleted once older than the retention, a small
+# batch at a time with a pause in between.
+SOFT_DELETE_RETENTION_IN_SECONDS = int(os.getenv("SOFT_DELETE_RETENTION_IN_SECONDS", 7 * 24 * 3600))
+PURGE_INTERVAL_IN_SECONDS = float(os.getenv("PURGE_INTERVAL_IN_SECONDS", 300))
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", 1000))
+PURGE_BATCH_PAUSE_IN_SECONDS = float(os.getenv("PURGE_BATCH_PAUSE_IN_SECONDS", 0.5))
+PURGE_LOCK_TIMEOUT_IN_MILLISECONDS = int(os.getenv("PURGE_LOCK_TIMEOUT_IN_MILLISECONDS", 1000))
@@ -1,7 +1,10 @@
+import asyncio
 import logging
-from databases import Database
+import time
+from fastapi import Request, Response
+from sqlalchemy import text
 from sqlalchemy.exc import PendingRollbackError
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -15,7 +18,11 @@ from api.database.configs import (
     MAX_OVERFLOW,
     POOL_TIMEOUT,
     POOL_RECYCLE,
+    DATABASE_ECHO,
+    REPLICA_DATABASE_HOST,
+    READ_YOUR_WRITES_WINDOW_IN_SECONDS,
 )
+from api.database.pool import InstrumentedPool
 
 logger = logging.getLogger(__name__)
 
@@ -26,8 +33,9 @@ DATABASE_URL = (
 
 engine = create_async_engine(
     DATABASE_URL,
-    echo=True,
+    echo=DATABASE_ECHO,
     future=True,
+    poolclass=InstrumentedPool,
     pool_size=POOL_SIZE,
     max_overflow=MAX_OVERFLOW,
     pool_timeout=POOL_TIMEOUT,
@@ -42,20 +50,45 @@ SessionLocal = sessionmaker(
 )
 
 Base = declarative_base()
-database = Database(DATABASE_URL)
 
-async def get_db():
+READ_ONLY_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Set on write requests; reads carrying it skip the replica until it expires.
+PRIMARY_PIN_COOKIE = "qc_read_primary_until"
+
+
+def get_pool_stats() -> dict:
+    return engine.pool.snapshot()
+
+
+async def warm_pool(target: AsyncEngine = engine):
+    # Open the pool's base connections up front so the first requests after
+    # a deploy do not pay for TCP, TLS and authentication.
+    size = target.pool.size()
+    connections = await asyncio.gather(*(target.connect() for _ in range(size)))
+    try:
+        await asyncio.gather(*(connection.execute(text("SELECT 1")) for connection in connections))
+    finally:
+        await asyncio.gather(*(connection.close() for connection in connections))
+    logger.info(f"Database pool of {target.url.host} warmed with {size} connections")
+
+
+async def get_db(request: Request, response: Response):
+    # AsyncSession checks a connection out of the pool on its first statement
+    # only, so handlers served from memory never touch the pool. Read-only
+    # requests skip the COMMIT round trip; closing the session returns the
+    # connection and the pool's reset-on-return ends the transaction.
+    if REPLICA_DATABASE_HOST and request.method not in READ_ONLY_METHODS:
+        response.set_cookie(PRIMARY_PIN_COOKIE, str(int(time.time()) + READ_YOUR_WRITES_WINDOW_IN_SECONDS),
+                            max_age=READ_YOUR_WRITES_WINDOW_IN_SECONDS, httponly=True, samesite="lax")
+
     session = SessionLocal()
     logger.debug(f"Created new AsyncSession: {id(session)}")
     try:
-        if session.is_active:
-            yield session
-        else:
-            logger.warning(f"Session {id(session)} is not active, attempting rollback")
-            await session.rollback()
-            yield session
-        await session.commit()
-        logger.debug(f"Session {id(session)} committed")
+        yield session
+        if request.method not in READ_ONLY_METHODS and session.in_transaction():
+            await session.commit()
+            logger.debug(f"Session {id(session)} committed")
     except PendingRollbackError as e:
         logger.error(f"PendingRollbackError in session {id(session)}: {str(e)}")
         await session.rollback()
@@ -68,6 +101,7 @@ async def get_db():
         await session.close()
         logger.debug(f"Session {id(session)} closed")
 
+
 async def init_db():
     async with engine.begin() as conn:
         try:
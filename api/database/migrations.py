@@ -0,0 +1,412 @@
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+from api.database.database import engine
+from api.database.notifications import ENUMERATIONS_CHANNEL, VENDORS_CHANNEL
+from api.database.persian import TRANSLATE_FROM, TRANSLATE_TO
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_LOCK_ID = 7301001
+MIGRATIONS_LOCK_POLL_INTERVAL_IN_SECONDS = 1
+
+
+def concurrent_index(name: str, definition: str) -> list:
+    # A failed CREATE INDEX CONCURRENTLY leaves an invalid index behind, so a
+    # rerun drops whatever carries the name before building it again.
+    return [
+        f"DROP INDEX CONCURRENTLY IF EXISTS {name}",
+        f"CREATE INDEX CONCURRENTLY {name} {definition}",
+    ]
+
+
+# Every migration is (version, statements); versions are applied once, in order,
+# each in its own transaction. Migrations in CONCURRENT_MIGRATIONS run outside a
+# transaction instead, so their index builds do not block reads or writes.
+MIGRATIONS = [
+    (
+        "0001_vendor_name_search",
+        [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            f"""
+            CREATE OR REPLACE FUNCTION qc_normalize(value text) RETURNS text
+                LANGUAGE sql IMMUTABLE PARALLEL SAFE
+                AS $$ SELECT lower(translate(value, '{TRANSLATE_FROM}', '{TRANSLATE_TO}')) $$
+            """,
+            # The search indexes need CONCURRENTLY, so they are built in 0006.
+        ],
+    ),
+    (
+        "0002_enumerations_change_notifications",
+        [
+            """
+            CREATE OR REPLACE FUNCTION qc_notify_change() RETURNS trigger
+                LANGUAGE plpgsql
+                AS $$
+                BEGIN
+                    PERFORM pg_notify(
+                        TG_ARGV[0],
+                        json_build_object(
+                            'op', TG_OP,
+                            'id', CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END
+                        )::text
+                    );
+                    RETURN NULL;
+                END
+                $$
+            """,
+            "DROP TRIGGER IF EXISTS enumerations_notify_change ON enumerations",
+            f"""
+            CREATE TRIGGER enumerations_notify_change
+                AFTER INSERT OR UPDATE OR DELETE ON enumerations
+                FOR EACH ROW EXECUTE FUNCTION qc_notify_change('{ENUMERATIONS_CHANNEL}')
+            """,
+        ],
+    ),
+    (
+        "0003_vendors_change_notifications",
+        [
+            "DROP TRIGGER IF EXISTS vendors_notify_change ON vendors",
+            f"""
+            CREATE TRIGGER vendors_notify_change
+                AFTER INSERT OR UPDATE OR DELETE ON vendors
+                FOR EACH ROW EXECUTE FUNCTION qc_notify_change('{VENDORS_CHANNEL}')
+            """,
+        ],
+    ),
+    (
+        "0004_city_vendor_stats",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS city_vendor_stats (
+                city_id integer PRIMARY KEY,
+                city_name varchar,
+                vendor_count bigint NOT NULL DEFAULT 0,
+                active_count bigint NOT NULL DEFAULT 0,
+                purchase_count bigint NOT NULL DEFAULT 0,
+                products_count bigint NOT NULL DEFAULT 0,
+                sold_products bigint NOT NULL DEFAULT 0,
+                same_city_orders bigint NOT NULL DEFAULT 0,
+                updated_at timestamptz NOT NULL DEFAULT now()
+            )
+            """,
+            """
+            CREATE OR REPLACE FUNCTION qc_city_vendor_stats_apply() RETURNS trigger
+                LANGUAGE plpgsql
+                AS $$
+                BEGIN
+                    IF TG_OP = 'TRUNCATE' THEN
+                        DELETE FROM city_vendor_stats;
+                        RETURN NULL;
+                    END IF;
+
+                    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                        INSERT INTO city_vendor_stats AS s (
+                            city_id, vendor_count, active_count, purchase_count,
+                            products_count, sold_products, same_city_orders
+                        )
+                        SELECT city_id, -count(*), -count(*) FILTER (WHERE is_active),
+                               -COALESCE(sum(purchase_count), 0), -COALESCE(sum(products_count), 0),
+                               -COALESCE(sum(sold_products), 0), -COALESCE(sum(same_city_orders), 0)
+                        FROM old_rows
+                        WHERE city_id IS NOT NULL
+                        GROUP BY city_id
+                        ON CONFLICT (city_id) DO UPDATE SET
+                            vendor_count = s.vendor_count + EXCLUDED.vendor_count,
+                            active_count = s.active_count + EXCLUDED.active_count,
+                            purchase_count = s.purchase_count + EXCLUDED.purchase_count,
+                            products_count = s.products_count + EXCLUDED.products_count,
+                            sold_products = s.sold_products + EXCLUDED.sold_products,
+                            same_city_orders = s.same_city_orders + EXCLUDED.same_city_orders,
+                            updated_at = now();
+                    END IF;
+
+                    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                        INSERT INTO city_vendor_stats AS s (
+                            city_id, city_name, vendor_count, active_count, purchase_count,
+                            products_count, sold_products, same_city_orders
+                        )
+                        SELECT city_id, max(city_name), count(*), count(*) FILTER (WHERE is_active),
+                               COALESCE(sum(purchase_count), 0), COALESCE(sum(products_count), 0),
+                               COALESCE(sum(sold_products), 0), COALESCE(sum(same_city_orders), 0)
+                        FROM new_rows
+                        WHERE city_id IS NOT NULL
+                        GROUP BY city_id
+                        ON CONFLICT (city_id) DO UPDATE SET
+                            city_name = COALESCE(EXCLUDED.city_name, s.city_name),
+                            vendor_count = s.vendor_count + EXCLUDED.vendor_count,
+                            active_count = s.active_count + EXCLUDED.active_count,
+                            purchase_count = s.purchase_count + EXCLUDED.purchase_count,
+                            products_count = s.products_count + EXCLUDED.products_count,
+                            sold_products = s.sold_products + EXCLUDED.sold_products,
+                            same_city_orders = s.same_city_orders + EXCLUDED.same_city_orders,
+                            updated_at = now();
+                    END IF;
+
+                    RETURN NULL;
+                END
+                $$
+            """,
+            # Writes wait until the backfill below has been committed together
+            # with the triggers, so no row is counted twice or missed.
+            "LOCK TABLE vendor_infos IN SHARE ROW EXCLUSIVE MODE",
+            "DROP TRIGGER IF EXISTS vendor_infos_city_stats_insert ON vendor_infos",
+            "DROP TRIGGER IF EXISTS vendor_infos_city_stats_update ON vendor_infos",
+            "DROP TRIGGER IF EXISTS vendor_infos_city_stats_delete ON vendor_infos",
+            "DROP TRIGGER IF EXISTS vendor_infos_city_stats_truncate ON vendor_infos",
+            """
+            CREATE TRIGGER vendor_infos_city_stats_insert
+                AFTER INSERT ON vendor_infos
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION qc_city_vendor_stats_apply()
+            """,
+            """
+            CREATE TRIGGER vendor_infos_city_stats_update
+                AFTER UPDATE ON vendor_infos
+                REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION qc_city_vendor_stats_apply()
+            """,
+            """
+            CREATE TRIGGER vendor_infos_city_stats_delete
+                AFTER DELETE ON vendor_infos
+                REFERENCING OLD TABLE AS old_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION qc_city_vendor_stats_apply()
+            """,
+            """
+            CREATE TRIGGER vendor_infos_city_stats_truncate
+                AFTER TRUNCATE ON vendor_infos
+                FOR EACH STATEMENT EXECUTE FUNCTION qc_city_vendor_stats_apply()
+            """,
+            "DELETE FROM city_vendor_stats",
+            """
+            INSERT INTO city_vendor_stats (
+                city_id, city_name, vendor_count, active_count, purchase_count,
+                products_count, sold_products, same_city_orders
+            )
+            SELECT city_id, max(city_name), count(*), count(*) FILTER (WHERE is_active),
+                   COALESCE(sum(purchase_count), 0), COALESCE(sum(products_count), 0),
+                   COALESCE(sum(sold_products), 0), COALESCE(sum(same_city_orders), 0)
+            FROM vendor_infos
+            WHERE city_id IS NOT NULL
+            GROUP BY city_id
+            """,
+        ],
+    ),
+    (
+        "0005_soft_delete",
+        [
+            "ALTER TABLE vendor_infos ADD COLUMN IF NOT EXISTS deleted_at timestamptz",
+            # vendors and enumerations used to stamp deleted_at on every ORM
+            # update, so the values there mark the last update, not a deletion.
+            # They move to legacy_deleted_at and deleted_at starts out empty.
+            "ALTER TABLE vendors ADD COLUMN IF NOT EXISTS legacy_deleted_at timestamp",
+            "UPDATE vendors SET legacy_deleted_at = deleted_at, deleted_at = NULL WHERE deleted_at IS NOT NULL",
+            "ALTER TABLE enumerations ADD COLUMN IF NOT EXISTS legacy_deleted_at timestamp",
+            "UPDATE enumerations SET legacy_deleted_at = deleted_at, deleted_at = NULL WHERE deleted_at IS NOT NULL",
+            # Same as 0004, but only live rows count: setting deleted_at
+            # removes a row from its city and purging it changes nothing.
+            """
+            CREATE OR REPLACE FUNCTION qc_city_vendor_stats_apply() RETURNS trigger
+                LANGUAGE plpgsql
+                AS $$
+                BEGIN
+                    IF TG_OP = 'TRUNCATE' THEN
+                        DELETE FROM city_vendor_stats;
+                        RETURN NULL;
+                    END IF;
+
+                    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                        INSERT INTO city_vendor_stats AS s (
+                            city_id, vendor_count, active_count, purchase_count,
+                            products_count, sold_products, same_city_orders
+                        )
+                        SELECT city_id, -count(*), -count(*) FILTER (WHERE is_active),
+                               -COALESCE(sum(purchase_count), 0), -COALESCE(sum(products_count), 0),
+                               -COALESCE(sum(sold_products), 0), -COALESCE(sum(same_city_orders), 0)
+                        FROM old_rows
+                        WHERE city_id IS NOT NULL AND deleted_at IS NULL
+                        GROUP BY city_id
+                        ON CONFLICT (city_id) DO UPDATE SET
+                            vendor_count = s.vendor_count + EXCLUDED.vendor_count,
+                            active_count = s.active_count + EXCLUDED.active_count,
+                            purchase_count = s.purchase_count + EXCLUDED.purchase_count,
+                            products_count = s.products_count + EXCLUDED.products_count,
+                            sold_products = s.sold_products + EXCLUDED.sold_products,
+                            same_city_orders = s.same_city_orders + EXCLUDED.same_city_orders,
+                            updated_at = now();
+                    END IF;
+
+                    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                        INSERT INTO city_vendor_stats AS s (
+                            city_id, city_name, vendor_count, active_count, purchase_count,
+                            products_count, sold_products, same_city_orders
+                        )
+                        SELECT city_id, max(city_name), count(*), count(*) FILTER (WHERE is_active),
+                               COALESCE(sum(purchase_count), 0), COALESCE(sum(products_count), 0),
+                               COALESCE(sum(sold_products), 0), COALESCE(sum(same_city_orders), 0)
+                        FROM new_rows
+                        WHERE city_id IS NOT NULL AND deleted_at IS NULL
+                        GROUP BY city_id
+                        ON CONFLICT (city_id) DO UPDATE SET
+                            city_name = COALESCE(EXCLUDED.city_name, s.city_name),
+                            vendor_count = s.vendor_count + EXCLUDED.vendor_count,
+                            active_count = s.active_count + EXCLUDED.active_count,
+                            purchase_count = s.purchase_count + EXCLUDED.purchase_count,
+                            products_count = s.products_count + EXCLUDED.products_count,
+                            sold_products = s.sold_products + EXCLUDED.sold_products,
+                            same_city_orders = s.same_city_orders + EXCLUDED.same_city_orders,
+                            updated_at = now();
+                    END IF;
+
+                    RETURN NULL;
+                END
+                $$
+            """,
+        ],
+    ),
+    (
+        "0006_lookup_indexes",
+        [
+            # vendor_infos read paths all filter on deleted_at IS NULL, so its hot
+            # indexes only need live rows and never carry rows waiting to be purged.
+            # Single and batched vendor lookups: DISTINCT ON (vendor_id) ... ORDER BY vendor_id, id.
+            *concurrent_index("ix_vendor_infos_vendor_id", "ON vendor_infos (vendor_id, id) WHERE deleted_at IS NULL"),
+            # City listing: city_id filter, then the same DISTINCT ON order.
+            *concurrent_index("ix_vendor_infos_city_id_vendor_id",
+                              "ON vendor_infos (city_id, vendor_id, id) WHERE deleted_at IS NULL"),
+            # Active vendor list and index loads filter on status and order by id.
+            *concurrent_index("ix_vendors_status", "ON vendors (status, id)"),
+            # Active vendor by profile; also serves the ON DELETE CASCADE from enumerations.
+            *concurrent_index("ix_vendors_profile_id", "ON vendors (profile_id, status)"),
+            *concurrent_index("ix_vendors_vendor_id", "ON vendors (vendor_id, status)"),
+            # Name search. Databases that ran an earlier 0001 also carry full
+            # search indexes under the old names; the live-row ones are built
+            # first, so search always has an index while those are dropped.
+            *concurrent_index(
+                "ix_vendor_infos_live_persian_name_trgm",
+                "ON vendor_infos USING gin (qc_normalize(vendor_persian_name) gin_trgm_ops) WHERE deleted_at IS NULL",
+            ),
+            *concurrent_index(
+                "ix_vendor_infos_live_english_name_trgm",
+                "ON vendor_infos USING gin (qc_normalize(vendor_english_name) gin_trgm_ops) WHERE deleted_at IS NULL",
+            ),
+            *concurrent_index(
+                "ix_vendor_infos_live_persian_name_prefix",
+                'ON vendor_infos ((qc_normalize(vendor_persian_name)) COLLATE "C", id) WHERE deleted_at IS NULL',
+            ),
+            *concurrent_index(
+                "ix_vendor_infos_live_english_name_prefix",
+                'ON vendor_infos ((qc_normalize(vendor_english_name)) COLLATE "C", id) WHERE deleted_at IS NULL',
+            ),
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_vendor_infos_persian_name_trgm",
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_vendor_infos_english_name_trgm",
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_vendor_infos_persian_name_prefix",
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_vendor_infos_english_name_prefix",
+            # The purger walks only the deleted rows, oldest first.
+            *concurrent_index("ix_vendor_infos_deleted_at",
+                              "ON vendor_infos (deleted_at) WHERE deleted_at IS NOT NULL"),
+            "ANALYZE vendor_infos",
+            "ANALYZE vendors",
+        ],
+    ),
+    (
+        "0007_vendor_infos_version",
+        [
+            # A constant default is stored in the catalog, so existing rows
+            # are not rewritten.
+            "ALTER TABLE vendor_infos ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1",
+        ],
+    ),
+    (
+        "0008_vendor_import_jobs",
+        [
+            # Import progress and rejected rows, readable from every worker.
+            """
+            CREATE TABLE IF NOT EXISTS vendor_import_jobs (
+                job_id text PRIMARY KEY,
+                status text NOT NULL,
+                filename text,
+                processed_rows integer NOT NULL DEFAULT 0,
+                valid_rows integer NOT NULL DEFAULT 0,
+                failed_rows integer NOT NULL DEFAULT 0,
+                inserted integer NOT NULL DEFAULT 0,
+                updated integer NOT NULL DEFAULT 0,
+                error text,
+                errors jsonb NOT NULL DEFAULT '[]',
+                started_at double precision,
+                finished_at double precision,
+                created_at timestamptz NOT NULL DEFAULT now()
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS ix_vendor_import_jobs_created_at ON vendor_import_jobs (created_at)",
+        ],
+    ),
+    (
+        "0009_change_version",
+        [
+            # Advanced by every vendors and enumerations write, so in-memory
+            # copies can name what they hold without hashing it. A sequence
+            # rather than a counter row: nextval takes no row lock.
+            "CREATE SEQUENCE IF NOT EXISTS qc_change_version",
+            """
+            CREATE OR REPLACE FUNCTION qc_notify_change() RETURNS trigger
+                LANGUAGE plpgsql
+                AS $$
+                BEGIN
+                    PERFORM nextval('qc_change_version');
+                    PERFORM pg_notify(
+                        TG_ARGV[0],
+                        json_build_object(
+                            'op', TG_OP,
+                            'id', CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END
+                        )::text
+                    );
+                    RETURN NULL;
+                END
+                $$
+            """,
+        ],
+    ),
+]
+
+CONCURRENT_MIGRATIONS = {"0006_lookup_indexes"}
+
+
+async def _apply(version: str, statements: list):
+    async with engine.connect() as conn:
+        if version in CONCURRENT_MIGRATIONS:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        async with conn.begin():
+            for statement in statements:
+                await conn.exec_driver_sql(statement)
+            await conn.execute(
+                text("INSERT INTO schema_migrations (version) VALUES (:version)"), {"version": version}
+            )
+
+
+async def run_migrations():
+    # A session lock, polled rather than waited on: a worker blocked inside
+    # pg_advisory_lock holds a snapshot, and CREATE INDEX CONCURRENTLY in the
+    # worker migrating would wait for it forever.
+    async with engine.connect() as lock_conn:
+        lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        while not (await lock_conn.exec_driver_sql(f"SELECT pg_try_advisory_lock({MIGRATIONS_LOCK_ID})")).scalar():
+            await asyncio.sleep(MIGRATIONS_LOCK_POLL_INTERVAL_IN_SECONDS)
+        try:
+            async with engine.begin() as conn:
+                await conn.exec_driver_sql(
+                    "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                    "version text PRIMARY KEY, applied_at timestamptz NOT NULL DEFAULT now())"
+                )
+                result = await conn.exec_driver_sql("SELECT version FROM schema_migrations")
+                applied = {row[0] for row in result}
+
+            for version, statements in MIGRATIONS:
+                if version in applied:
+                    continue
+                logger.info(f"Applying migration {version}")
+                await _apply(version, statements)
+        finally:
+            await lock_conn.exec_driver_sql(f"SELECT pg_advisory_unlock({MIGRATIONS_LOCK_ID})")
@@ -0,0 +1,115 @@
+import asyncio
+import inspect
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.database.database import engine
+
+logger = logging.getLogger(__name__)
+
+ENUMERATIONS_CHANNEL = "qc_enumerations_changed"
+VENDORS_CHANNEL = "qc_vendors_changed"
+
+RECONNECT_DELAY_IN_SECONDS = 1
+MAX_RECONNECT_DELAY_IN_SECONDS = 30
+
+CHANGE_VERSION_QUERY = text("SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM qc_change_version")
+
+
+async def current_change_version(session: AsyncSession) -> int:
+    # Read after the data: every write committed before the data query took
+    # its snapshot drew its number earlier, so the result covers it.
+    return (await session.execute(CHANGE_VERSION_QUERY)).scalar()
+
+
+class NotificationListener:
+    """Holds one connection from the shared engine and dispatches Postgres NOTIFY payloads."""
+
+    def __init__(self):
+        self._callbacks: Dict[str, List[Callable]] = defaultdict(list)
+        self._reconnect_callbacks: List[Callable] = []
+        self._connection = None
+        self._driver_connection = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def subscribe(self, channel: str, callback: Callable[[str], object]):
+        self._callbacks[channel].append(callback)
+        if self._driver_connection is not None:
+            asyncio.ensure_future(self._driver_connection.add_listener(channel, self._dispatch))
+
+    def on_reconnect(self, callback: Callable[[], object]):
+        # Notifications sent while the connection was down are lost, so
+        # subscribers get a chance to drop whatever they cached.
+        self._reconnect_callbacks.append(callback)
+
+    async def start(self):
+        self._closing = False
+        self._connection = await engine.connect()
+        raw_connection = await self._connection.get_raw_connection()
+        self._driver_connection = raw_connection.driver_connection
+        self._driver_connection.add_termination_listener(self._on_termination)
+        for channel in self._callbacks:
+            await self._driver_connection.add_listener(channel, self._dispatch)
+        logger.info(f"Listening on {', '.join(self._callbacks) or 'no channels'}")
+
+    async def stop(self):
+        self._closing = True
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+        if self._connection is not None:
+            try:
+                for channel in self._callbacks:
+                    await self._driver_connection.remove_listener(channel, self._dispatch)
+                await self._connection.close()
+            except Exception as e:
+                logger.warning(f"Error while closing the notification connection: {str(e)}")
+        self._connection = None
+        self._driver_connection = None
+
+    def _dispatch(self, connection, pid, channel, payload):
+        for callback in self._callbacks.get(channel, ()):
+            self._run(callback, payload)
+
+    def _run(self, callback: Callable, *args):
+        try:
+            result = callback(*args)
+            if inspect.isawaitable(result):
+                asyncio.ensure_future(result)
+        except Exception as e:
+            logger.error(f"Notification callback {callback!r} failed: {str(e)}")
+
+    def _on_termination(self, connection):
+        if self._closing:
+            return
+        logger.warning("Notification connection lost, reconnecting")
+        self._driver_connection = None
+        self._reconnect_task = asyncio.ensure_future(self._reconnect())
+
+    async def _reconnect(self):
+        if self._connection is not None:
+            try:
+                await self._connection.invalidate()
+            except Exception:
+                pass
+            self._connection = None
+
+        delay = RECONNECT_DELAY_IN_SECONDS
+        while not self._closing:
+            try:
+                await self.start()
+                break
+            except Exception as e:
+                logger.error(f"Reconnecting the notification listener failed: {str(e)}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY_IN_SECONDS)
+
+        for callback in self._reconnect_callbacks:
+            self._run(callback)
+
+
+notification_listener = NotificationListener()
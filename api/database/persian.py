@@ -0,0 +1,19 @@
+ZERO_WIDTH_NON_JOINER = "‌"
+
+# Character folding shared by qc_normalize in the database and
+# normalize_persian in the API, kept here so the migrations do not depend on
+# the API package.
+PERSIAN_REPLACEMENTS = {
+    "ي": "ی",  # Arabic yeh -> Persian yeh
+    "ى": "ی",  # Alef maksura -> Persian yeh
+    "ك": "ک",  # Arabic kaf -> Persian keheh
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},  # Persian digits
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},  # Arabic-Indic digits
+}
+PERSIAN_REMOVALS = ZERO_WIDTH_NON_JOINER + "‏" + "".join(chr(code) for code in range(0x064B, 0x0653))
+
+# `translate(text, TRANSLATE_FROM, TRANSLATE_TO)` in Postgres applies the
+# replacements and drops the removals: characters past the end of
+# TRANSLATE_TO are deleted.
+TRANSLATE_FROM = "".join(PERSIAN_REPLACEMENTS) + PERSIAN_REMOVALS
+TRANSLATE_TO = "".join(PERSIAN_REPLACEMENTS.values())
@@ -0,0 +1,78 @@
+import bisect
+import time
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from api.database.configs import POOL_WAIT_BUCKETS
+
+
+class PoolStats:
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.timeouts = 0
+        self.overflow_checkouts = 0
+        self.max_overflow_used = 0
+
+    def observe_wait(self, seconds: float):
+        self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.wait_count += 1
+        self.wait_sum += seconds
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long callers wait for a connection and how far it overflows."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats(POOL_WAIT_BUCKETS)
+
+    def _do_get(self):
+        stats = self.stats
+        stats.waiting += 1
+        stats.max_waiting = max(stats.max_waiting, stats.waiting)
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            stats.timeouts += 1
+            raise
+        finally:
+            stats.waiting -= 1
+            stats.observe_wait(time.perf_counter() - started)
+
+        overflow = self.overflow()
+        if overflow > 0:
+            stats.overflow_checkouts += 1
+            stats.max_overflow_used = max(stats.max_overflow_used, overflow)
+        return connection
+
+    def snapshot(self) -> dict:
+        stats = self.stats
+        cumulative = 0
+        histogram = []
+        for bound, count in zip(stats.buckets + ["+Inf"], stats.bucket_counts):
+            cumulative += count
+            histogram.append({"le": bound, "count": cumulative})
+
+        return {
+            "pool_size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "waiting": stats.waiting,
+            "max_waiting": stats.max_waiting,
+            "timeouts": stats.timeouts,
+            "overflow_checkouts": stats.overflow_checkouts,
+            "max_overflow_used": stats.max_overflow_used,
+            "wait_seconds": {
+                "count": stats.wait_count,
+                "sum": stats.wait_sum,
+                "histogram": histogram,
+            },
+        }
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+from api.database.configs import (
+    SOFT_DELETE_RETENTION_IN_SECONDS,
+    PURGE_INTERVAL_IN_SECONDS,
+    PURGE_BATCH_SIZE,
+    PURGE_BATCH_PAUSE_IN_SECONDS,
+    PURGE_LOCK_TIMEOUT_IN_MILLISECONDS,
+)
+from api.database.database import engine
+
+logger = logging.getLogger(__name__)
+
+PURGE_LOCK_ID = 7301002
+
+# Oldest soft-deleted rows first, through the partial deleted_at index.
+# Only vendor_infos is soft-deleted; vendors and enumerations are never
+# deleted by this service.
+PURGE_STATEMENTS = {
+    "vendor_infos": """
+        DELETE FROM vendor_infos WHERE id IN (
+            SELECT id FROM vendor_infos
+            WHERE deleted_at < now() - make_interval(secs => :retention)
+            ORDER BY deleted_at
+            LIMIT :batch_size
+            FOR UPDATE SKIP LOCKED
+        )
+    """,
+}
+
+
+class SoftDeletePurger:
+    """Hard-deletes rows soft-deleted longer than the retention, in small throttled batches.
+
+    Every batch is its own short transaction that gives up on a lock wait
+    instead of queueing behind it, and one worker at a time purges.
+    """
+
+    def __init__(self, retention: int = SOFT_DELETE_RETENTION_IN_SECONDS,
+                 interval: float = PURGE_INTERVAL_IN_SECONDS, batch_size: int = PURGE_BATCH_SIZE,
+                 pause: float = PURGE_BATCH_PAUSE_IN_SECONDS):
+        self.retention = retention
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self.purged: Dict[str, int] = {table: 0 for table in PURGE_STATEMENTS}
+        self.batches = 0
+        self.failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _purge_batch(self, table: str) -> Optional[int]:
+        """Rows removed, or None when another worker holds the purge lock."""
+        async with engine.begin() as connection:
+            locked = (await connection.execute(
+                text("SELECT pg_try_advisory_xact_lock(:lock_id)"), {"lock_id": PURGE_LOCK_ID}
+            )).scalar()
+            if not locked:
+                return None
+            await connection.exec_driver_sql(f"SET LOCAL lock_timeout = {PURGE_LOCK_TIMEOUT_IN_MILLISECONDS}")
+            result = await connection.execute(
+                text(PURGE_STATEMENTS[table]), {"retention": self.retention, "batch_size": self.batch_size}
+            )
+            return result.rowcount
+
+    async def purge(self) -> Dict[str, int]:
+        purged = {}
+        for table in PURGE_STATEMENTS:
+            purged[table] = 0
+            while True:
+                deleted = await self._purge_batch(table)
+                if deleted is None:
+                    return purged
+                self.batches += 1
+                purged[table] += deleted
+                self.purged[table] += deleted
+                if deleted < self.batch_size:
+                    break
+                await asyncio.sleep(self.pause)
+        if any(purged.values()):
+            logger.info(f"Purged soft-deleted rows: {purged}")
+        return purged
+
+    def start(self):
+        if self._task is not None:
+            return
+
+        async def purge_forever():
+            while True:
+                await asyncio.sleep(self.interval)
+                try:
+                    await self.purge()
+                except Exception as e:
+                    self.failures += 1
+                    logger.error(f"Purging soft-deleted rows failed: {str(e)}")
+
+        self._task = asyncio.ensure_future(purge_forever())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "retention_seconds": self.retention,
+            "batch_size": self.batch_size,
+            "batches": self.batches,
+            "failures": self.failures,
+            "purged": dict(self.purged),
+        }
+
+
+soft_delete_purger = SoftDeletePurger()
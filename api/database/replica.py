@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from api.database.configs import (
+    REPLICA_DATABASE_HOST,
+    REPLICA_DATABASE_PORT,
+    REPLICA_DATABASE_USERNAME,
+    REPLICA_DATABASE_PASSWORD,
+    REPLICA_DATABASE_NAME,
+    REPLICA_POOL_SIZE,
+    REPLICA_MAX_OVERFLOW,
+    REPLICA_MAX_LAG_IN_SECONDS,
+    REPLICA_LAG_CHECK_INTERVAL_IN_SECONDS,
+    POOL_TIMEOUT,
+    POOL_RECYCLE,
+    DATABASE_ECHO,
+)
+from api.database.database import SessionLocal, PRIMARY_PIN_COOKIE
+from api.database.pool import InstrumentedPool
+
+logger = logging.getLogger(__name__)
+
+# The age of the last replayed transaction, or zero while the replica has
+# replayed everything it received from a connected WAL receiver. A replica
+# whose receiver is down reports the replay age even when the received and
+# replayed positions match, since nothing new arrives to move them apart.
+# pg_stat_wal_receiver has a row only while the receiver runs; its details
+# are hidden from roles without pg_read_all_stats, so only the row is tested.
+# A primary reports zero.
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+             AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver) THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+replica_engine = None
+ReplicaSessionLocal = None
+if REPLICA_DATABASE_HOST:
+    replica_engine = create_async_engine(
+        f"postgresql+asyncpg://{REPLICA_DATABASE_USERNAME}:{REPLICA_DATABASE_PASSWORD}"
+        f"@{REPLICA_DATABASE_HOST}:{REPLICA_DATABASE_PORT}/{REPLICA_DATABASE_NAME}",
+        echo=DATABASE_ECHO,
+        future=True,
+        poolclass=InstrumentedPool,
+        pool_size=REPLICA_POOL_SIZE,
+        max_overflow=REPLICA_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+    ReplicaSessionLocal = sessionmaker(
+        bind=replica_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+
+
+class ReplicaMonitor:
+    """Polls replication lag and decides whether reads may go to the replica."""
+
+    def __init__(self, max_lag: float = REPLICA_MAX_LAG_IN_SECONDS,
+                 interval: float = REPLICA_LAG_CHECK_INTERVAL_IN_SECONDS):
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lag: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.pinned_reads = 0
+
+    @property
+    def usable(self) -> bool:
+        # Without a recent successful check the lag is unknown, which counts
+        # as too far behind.
+        return (
+                self.lag is not None
+                and self.lag <= self.max_lag
+                and time.monotonic() - self.checked_at <= self.interval * 3
+        )
+
+    async def check(self):
+        try:
+            async with replica_engine.connect() as connection:
+                self.lag = float((await connection.execute(REPLICA_LAG_QUERY)).scalar())
+            self.checked_at = time.monotonic()
+        except Exception as e:
+            self.lag = None
+            logger.error(f"Replica lag check failed, reading from the primary: {str(e)}")
+
+    def start(self):
+        if replica_engine is None or self._task is not None:
+            return
+
+        async def check_forever():
+            while True:
+                was_usable = self.usable
+                await self.check()
+                if was_usable != self.usable:
+                    logger.warning(f"Replica {'in' if self.usable else 'out of'} rotation, lag {self.lag}s")
+                await asyncio.sleep(self.interval)
+
+        self._task = asyncio.ensure_future(check_forever())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if replica_engine is not None:
+            await replica_engine.dispose()
+
+    def stats(self) -> dict:
+        return {
+            "configured": replica_engine is not None,
+            "usable": self.usable,
+            "lag_seconds": self.lag,
+            "max_lag_seconds": self.max_lag,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "pinned_reads": self.pinned_reads,
+            "pool": replica_engine.pool.snapshot() if replica_engine is not None else None,
+        }
+
+
+replica_monitor = ReplicaMonitor()
+
+
+def _pinned_to_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def read_session_factory(request: Request) -> sessionmaker:
+    """The replica while it keeps up, else the primary.
+
+    Clients that wrote recently carry the pin cookie set by get_db and keep
+    reading from the primary until it expires, so they see their own writes.
+    """
+    if replica_engine is None:
+        return SessionLocal
+    if _pinned_to_primary(request):
+        replica_monitor.pinned_reads += 1
+        return SessionLocal
+    if replica_monitor.usable:
+        replica_monitor.replica_reads += 1
+        return ReplicaSessionLocal
+    replica_monitor.primary_reads += 1
+    return SessionLocal
+
+
+async def get_read_db(request: Request):
+    session = read_session_factory(request)()
+    try:
+        yield session
+    finally:
+        await session.close()
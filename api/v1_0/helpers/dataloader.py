@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Iterable, List, Optional, Set, TypeVar
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class DataLoader(Generic[K, V]):
+    """Coalesces the `load` calls made during one event-loop tick into batched `batch_load` calls.
+
+    `batch_load` receives unique keys and returns a mapping; keys missing
+    from it resolve to None. Results are not cached between batches.
+    """
+
+    def __init__(self, batch_load: Callable[[List[K]], Awaitable[Dict[K, V]]], max_batch_size: int = 1000):
+        self.batch_load = batch_load
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[K, asyncio.Future] = {}
+        self._dispatch_handle: Optional[asyncio.Handle] = None
+        # The loop keeps only weak references to tasks.
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.loads = 0
+
+    async def load(self, key: K) -> Optional[V]:
+        self.loads += 1
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            if self._dispatch_handle is None:
+                self._dispatch_handle = loop.call_soon(self._dispatch)
+        # A cancelled caller must not cancel the lookup shared with others.
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: Iterable[K]) -> List[Optional[V]]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _dispatch(self):
+        pending, self._pending = self._pending, {}
+        self._dispatch_handle = None
+        keys = list(pending)
+        for start in range(0, len(keys), self.max_batch_size):
+            chunk = keys[start:start + self.max_batch_size]
+            task = asyncio.ensure_future(self._run(chunk, [pending[key] for key in chunk]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, keys: List[K], futures: List[asyncio.Future]):
+        self.batches += 1
+        try:
+            values = await self.batch_load(keys)
+        except BaseException as e:
+            # Cancellation included, or the callers would wait forever.
+            logger.error(f"Batch load of {len(keys)} keys failed: {e!r}")
+            for future in futures:
+                if future.done():
+                    continue
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for key, future in zip(keys, futures):
+            if not future.done():
+                future.set_result(values.get(key))
+
+    def stats(self) -> dict:
+        return {"loads": self.loads, "batches": self.batches, "pending": len(self._pending)}
@@ -0,0 +1,181 @@
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from typing import Iterable, List, Sequence
+from xml.sax.saxutils import escape
+
+import orjson
+
+_ILLEGAL_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _plain(value):
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value).decode()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class NdjsonWriter:
+    media_type = "application/x-ndjson"
+    extension = "ndjson"
+
+    def __init__(self, columns: Sequence[str]):
+        self.columns = list(columns)
+
+    def header(self) -> bytes:
+        return b""
+
+    def rows(self, rows: Iterable[Sequence]) -> bytes:
+        return b"".join(orjson.dumps(dict(zip(self.columns, row))) + b"\n" for row in rows)
+
+    def close(self) -> bytes:
+        return b""
+
+
+class CsvWriter:
+    media_type = "text/csv"
+    extension = "csv"
+
+    def __init__(self, columns: Sequence[str]):
+        self.columns = list(columns)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def header(self) -> bytes:
+        # The BOM lets Excel detect UTF-8, which Persian names need.
+        self._writer.writerow(self.columns)
+        return "\ufeff".encode() + self._drain()
+
+    def rows(self, rows: Iterable[Sequence]) -> bytes:
+        self._writer.writerows([_plain(value) for value in row] for row in rows)
+        return self._drain()
+
+    def close(self) -> bytes:
+        return b""
+
+
+class _ChunkSink:
+    # Write-only file object; zipfile falls back to data descriptors when it
+    # cannot tell() or seek(), which is what makes streaming possible.
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class XlsxWriter:
+    """Minimal single-sheet Office Open XML workbook written as a stream of zip chunks."""
+
+    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    extension = "xlsx"
+
+    _CONTENT_TYPES = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    )
+    _ROOT_RELS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    )
+    _WORKBOOK = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+    _WORKBOOK_RELS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    )
+    _SHEET_START = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+    )
+    _SHEET_END = '</sheetData></worksheet>'
+
+    def __init__(self, columns: Sequence[str], sheet_name: str = "vendors"):
+        self.columns = list(columns)
+        self.sheet_name = sheet_name
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, "w", compression=zipfile.ZIP_DEFLATED)
+        self._sheet = None
+
+    @staticmethod
+    def _cell(value) -> str:
+        value = _plain(value)
+        if value is None:
+            return "<c/>"
+        if isinstance(value, bool):
+            return f'<c t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, (int, float)):
+            return f"<c><v>{value}</v></c>"
+        text = escape(_ILLEGAL_XML_CHARS.sub("", str(value)))
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+    def _row(self, values) -> str:
+        return "<row>" + "".join(self._cell(value) for value in values) + "</row>"
+
+    def header(self) -> bytes:
+        self._zip.writestr("[Content_Types].xml", self._CONTENT_TYPES)
+        self._zip.writestr("_rels/.rels", self._ROOT_RELS)
+        self._zip.writestr("xl/workbook.xml", self._WORKBOOK.format(sheet=escape(self.sheet_name)))
+        self._zip.writestr("xl/_rels/workbook.xml.rels", self._WORKBOOK_RELS)
+        self._sheet = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._sheet.write((self._SHEET_START + self._row(self.columns)).encode())
+        return self._sink.drain()
+
+    def rows(self, rows: Iterable[Sequence]) -> bytes:
+        self._sheet.write("".join(self._row(row) for row in rows).encode())
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._sheet.write(self._SHEET_END.encode())
+        self._sheet.close()
+        self._zip.close()
+        return self._sink.drain()
+
+
+EXPORT_WRITERS = {
+    "ndjson": NdjsonWriter,
+    "csv": CsvWriter,
+    "xlsx": XlsxWriter,
+}
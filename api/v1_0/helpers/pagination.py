@@ -0,0 +1,58 @@
+import asyncio
+import base64
+import json
+import time
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+
+
+def encode_cursor(**values) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if not isinstance(values, dict):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def cursor_int(position: dict, key: str) -> int:
+    try:
+        return int(position[key])
+    except (KeyError, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+class CachedCount:
+    """Keeps a total count around for `ttl` seconds and refreshes it with one query at a time."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._value: Optional[int] = None
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._fetched_at = 0.0
+
+    def adjust(self, delta: int):
+        if self._value is not None:
+            self._value = max(0, self._value + delta)
+
+    async def get(self, fetch: Callable[[], Awaitable[int]]) -> int:
+        if self._value is not None and time.monotonic() - self._fetched_at < self.ttl:
+            return self._value
+
+        async with self._lock:
+            if self._value is None or time.monotonic() - self._fetched_at >= self.ttl:
+                self._value = await fetch()
+                self._fetched_at = time.monotonic()
+        return self._value
@@ -0,0 +1,18 @@
+import re
+
+from api.database.persian import PERSIAN_REPLACEMENTS, PERSIAN_REMOVALS
+
+_TABLE = str.maketrans({**PERSIAN_REPLACEMENTS, **{char: None for char in PERSIAN_REMOVALS}})
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_persian(value: str) -> str:
+    # The same folding and lowercasing as qc_normalize in the database, which
+    # does not touch whitespace. Runs of whitespace are collapsed and the ends
+    # trimmed here only, which suits search terms matched with LIKE against
+    # the normalized columns.
+    return _WHITESPACE.sub(" ", value.translate(_TABLE)).strip().lower()
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
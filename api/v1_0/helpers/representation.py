@@ -0,0 +1,161 @@
+import asyncio
+import gzip
+import hashlib
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 5))
+
+_COMPRESSORS = {"gzip": lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL)}
+if brotli is not None:
+    _COMPRESSORS["br"] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+# Server preference when the client accepts several with the same q.
+_PREFERENCE = ["br", "gzip"]
+
+
+class DataVersion:
+    """Names the contents of an in-memory copy by the change version read after loading it.
+
+    The version comes from the qc_change_version sequence, which every
+    vendors and enumerations write advances, so workers holding the same
+    data hand out the same tag and a conditional request is answered before
+    anything is loaded or serialized. When a reload finds the sequence where
+    it was, a change committed between the two reads may carry an older
+    number; the tag is withheld then and the body hash used instead.
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.tag: Optional[str] = None
+
+    def advance(self, version: int):
+        if self.version is None or version > self.version:
+            self.tag = f"v{version}"
+            self.version = version
+        else:
+            self.tag = None
+
+
+class Representation:
+    """One version of a response body with its strong ETag and compressed variants.
+
+    The ETag is the data version when the caller knows it, else a hash of
+    the body; either way every worker holding the same data hands out the
+    same tag.
+    """
+
+    __slots__ = ("body", "tag", "_encoded")
+
+    def __init__(self, body: bytes, tag: Optional[str] = None):
+        self.body = body
+        self.tag = tag or hashlib.blake2b(body, digest_size=16).hexdigest()
+        self._encoded: Dict[str, bytes] = {}
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        # Compressed variants are different representations and need
+        # their own strong validators.
+        return f'"{self.tag}-{encoding}"' if encoding else f'"{self.tag}"'
+
+    def matches(self, if_none_match: str) -> bool:
+        return _matching_etag(if_none_match, self.tag) is not None
+
+    async def encoded(self, encoding: str) -> bytes:
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = await asyncio.to_thread(_COMPRESSORS[encoding], self.body)
+            self._encoded[encoding] = body
+        return body
+
+
+def _matching_etag(if_none_match: str, tag: str) -> Optional[str]:
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return f'"{tag}"'
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"').split("-", 1)[0] == tag:
+            return candidate
+    return None
+
+
+def _accepted_encodings(accept_encoding: str) -> List[str]:
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    wildcard = weights.get("*", 0.0)
+    accepted = [name for name in _PREFERENCE if name in _COMPRESSORS and weights.get(name, wildcard) > 0]
+    return sorted(accepted, key=lambda name: -weights.get(name, wildcard))
+
+
+async def conditional_response(request: Request, representation: Representation,
+                               media_type: str = "application/json") -> Response:
+    """304 when the client already holds this version, otherwise the body, compressed if accepted."""
+    encoding = None
+    if len(representation.body) >= COMPRESSION_MIN_SIZE:
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = accepted[0] if accepted else None
+
+    headers = {"ETag": representation.etag(encoding), "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and representation.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    if encoding is None:
+        return Response(content=representation.body, media_type=media_type, headers=headers)
+    headers["Content-Encoding"] = encoding
+    return Response(content=await representation.encoded(encoding), media_type=media_type, headers=headers)
+
+
+def not_modified(request: Request, tag: Optional[str]) -> Optional[Response]:
+    """304 when the client holds the version named by `tag`, decided without the body."""
+    if_none_match = request.headers.get("if-none-match")
+    if tag is None or not if_none_match:
+        return None
+    etag = _matching_etag(if_none_match, tag)
+    if etag is None:
+        return None
+    return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"})
+
+
+class RepresentationSlot:
+    """Holds the current representation of a single resource until it is invalidated or expires."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._representation: Optional[Representation] = None
+        self._expiry = 0.0
+        self._generation = 0
+
+    async def get(self, build: Callable[[], Awaitable[Representation]]) -> Representation:
+        if self._representation is not None and time.monotonic() < self._expiry:
+            return self._representation
+
+        generation = self._generation
+        representation = await build()
+        if generation == self._generation:
+            self._representation = representation
+            self._expiry = time.monotonic() + self.ttl
+        return representation
+
+    def invalidate(self, payload: str = None):
+        self._generation += 1
+        self._representation = None
@@ -0,0 +1,338 @@
+import asyncio
+import logging
+import os
+import struct
+import time
+import uuid
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
+
+import orjson
+from redis import asyncio as redis
+from redis.exceptions import RedisError
+
+from api.v1_0.helpers.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL")
+RESPONSE_CACHE_TTL_IN_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_IN_SECONDS", 60))
+RESPONSE_CACHE_STALE_IN_SECONDS = int(os.getenv("RESPONSE_CACHE_STALE_IN_SECONDS", 30))
+RESPONSE_CACHE_L1_TTL_IN_SECONDS = int(os.getenv("RESPONSE_CACHE_L1_TTL_IN_SECONDS", 5))
+RESPONSE_CACHE_L1_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_L1_MAX_SIZE", 5000))
+RESPONSE_CACHE_LOCK_TIMEOUT_IN_SECONDS = float(os.getenv("RESPONSE_CACHE_LOCK_TIMEOUT_IN_SECONDS", 5))
+LOCK_POLL_INTERVAL_IN_SECONDS = 0.05
+MAX_RECONNECT_DELAY_IN_SECONDS = 30
+DELETE_BATCH_SIZE = 1000
+
+KEY_PREFIX = "qc:rc:"
+INVALIDATION_CHANNEL = "qc:rc:invalidate"
+
+# Tags an entry depends on; a write invalidates the tags it touched.
+VENDOR_INFOS_TAG = "vendor_infos"
+PROFILES_TAG = "profiles"
+
+# Entries in Redis are prefixed with the wall-clock time they stay fresh
+# until, so every worker agrees on when a refresh is due.
+_FRESH_UNTIL = struct.Struct("!d")
+
+_UNLOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Writes an entry only if none of its tags was invalidated since the load
+# began, on any worker. Tag indexes are sorted by entry expiry, so members
+# that outlived their entry are trimmed on the next write.
+# KEYS: entry, one generation key per tag, one index key per tag.
+# ARGV: tag count, value, expiry in seconds, now, entry name, generations.
+_WRITE_SCRIPT = """
+local tags = tonumber(ARGV[1])
+for i = 1, tags do
+    if (redis.call('get', KEYS[1 + i]) or '0') ~= ARGV[5 + i] then
+        return 0
+    end
+end
+redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+for i = 1, tags do
+    local index_key = KEYS[1 + tags + i]
+    redis.call('zremrangebyscore', index_key, '-inf', ARGV[4])
+    redis.call('zadd', index_key, ARGV[4] + ARGV[3], ARGV[5])
+    redis.call('expire', index_key, ARGV[3])
+end
+return 1
+"""
+
+
+def _generation_key(tag: str) -> str:
+    return KEY_PREFIX + "gen:" + tag
+
+
+def _index_key(tag: str) -> str:
+    return KEY_PREFIX + "tags:" + tag
+
+
+def vendor_tag(vendor_id: int) -> str:
+    return f"vendor:{vendor_id}"
+
+
+def city_tag(city_id: int) -> str:
+    return f"city:{city_id}"
+
+
+def profile_tag(profile_id: int) -> str:
+    return f"profile:{profile_id}"
+
+
+def cache_key(route: str, **params) -> str:
+    query = "&".join(f"{name}={params[name]}" for name in sorted(params) if params[name] is not None)
+    return f"{route}?{query}"
+
+
+class ResponseCache:
+    """Serialized responses in a per-process LRU in front of a shared Redis, invalidated by tag.
+
+    Without REDIS_URL only the in-process tier is used.
+    """
+
+    def __init__(self, redis_url: Optional[str] = REDIS_URL, ttl: float = RESPONSE_CACHE_TTL_IN_SECONDS,
+                 stale_ttl: float = RESPONSE_CACHE_STALE_IN_SECONDS,
+                 l1_ttl: float = RESPONSE_CACHE_L1_TTL_IN_SECONDS, l1_max_size: int = RESPONSE_CACHE_L1_MAX_SIZE):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._l1 = TTLCache(max_size=l1_max_size, default_ttl=min(l1_ttl, ttl))
+        self._redis = redis.from_url(redis_url) if redis_url else None
+        self._unlock = self._redis.register_script(_UNLOCK_SCRIPT) if self._redis else None
+        self._write_if_current = self._redis.register_script(_WRITE_SCRIPT) if self._redis else None
+        self._inflight = {}
+        self._generation = 0
+        self._listener_task: Optional[asyncio.Task] = None
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self.redis_errors = 0
+
+    async def get(self, key: str, tags: Iterable[str], load: Callable[[], Awaitable[bytes]]) -> bytes:
+        entry = self._l1.get(key)
+        if entry is not None:
+            return entry[0]
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(key, tuple(tags), load))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(future)
+
+    async def _fetch(self, key: str, tags: Tuple[str, ...], load: Callable[[], Awaitable[bytes]]) -> bytes:
+        if self._redis is None:
+            return await self._load(key, tags, load)
+
+        entry = await self._read(key)
+        if entry is not None:
+            fresh_until, body = entry
+            if time.time() < fresh_until:
+                self.l2_hits += 1
+                self._l1.set(key, (body, tags))
+                return body
+            # Stale: one worker refreshes while the rest keep serving the
+            # old body until the new one lands.
+            lock = await self._acquire(key)
+            if lock is None:
+                self.stale_hits += 1
+                return body
+            self.refreshes += 1
+            try:
+                return await self._load(key, tags, load)
+            finally:
+                await self._release(key, lock)
+
+        self.l2_misses += 1
+        lock = await self._acquire(key)
+        if lock is not None:
+            try:
+                return await self._load(key, tags, load)
+            finally:
+                await self._release(key, lock)
+
+        # Another worker is loading the same key; wait for its result
+        # instead of repeating the query.
+        deadline = time.monotonic() + RESPONSE_CACHE_LOCK_TIMEOUT_IN_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL_IN_SECONDS)
+            entry = await self._read(key)
+            if entry is not None:
+                self._l1.set(key, (entry[1], tags))
+                return entry[1]
+        return await self._load(key, tags, load)
+
+    async def _load(self, key: str, tags: Tuple[str, ...], load: Callable[[], Awaitable[bytes]]) -> bytes:
+        generation = self._generation
+        generations = await self._read_generations(tags)
+        body = await load()
+        # An invalidation that arrived while loading means `body` may
+        # already be stale, so serve it once but do not keep it. Redis
+        # repeats the check for invalidations made by other workers.
+        if generation == self._generation:
+            self._l1.set(key, (body, tags))
+            if generations is not None:
+                await self._write(key, tags, body, generations)
+        return body
+
+    async def _read_generations(self, tags: Tuple[str, ...]) -> Optional[List[str]]:
+        if self._redis is None:
+            return None
+        try:
+            values = await self._redis.mget([_generation_key(tag) for tag in tags]) if tags else []
+        except RedisError as e:
+            self._redis_failed("read", e)
+            return None
+        return [value.decode() if value is not None else "0" for value in values]
+
+    async def _read(self, key: str) -> Optional[Tuple[float, bytes]]:
+        try:
+            value = await self._redis.get(KEY_PREFIX + key)
+        except RedisError as e:
+            self._redis_failed("read", e)
+            return None
+        if value is None:
+            return None
+        return _FRESH_UNTIL.unpack_from(value)[0], value[_FRESH_UNTIL.size:]
+
+    async def _write(self, key: str, tags: Tuple[str, ...], body: bytes, generations: List[str]):
+        expire = int(self.ttl + self.stale_ttl)
+        now = time.time()
+        try:
+            await self._write_if_current(
+                keys=[KEY_PREFIX + key, *map(_generation_key, tags), *map(_index_key, tags)],
+                args=[len(tags), _FRESH_UNTIL.pack(now + self.ttl) + body, expire, now, key, *generations],
+            )
+        except RedisError as e:
+            self._redis_failed("write", e)
+
+    async def _acquire(self, key: str) -> Optional[str]:
+        lock = uuid.uuid4().hex
+        try:
+            acquired = await self._redis.set(KEY_PREFIX + "lock:" + key, lock, nx=True,
+                                             px=int(RESPONSE_CACHE_LOCK_TIMEOUT_IN_SECONDS * 1000))
+        except RedisError as e:
+            # Without Redis there is nobody to coordinate with.
+            self._redis_failed("lock", e)
+            return lock
+        return lock if acquired else None
+
+    async def _release(self, key: str, lock: str):
+        try:
+            await self._unlock(keys=[KEY_PREFIX + "lock:" + key], args=[lock])
+        except RedisError as e:
+            self._redis_failed("unlock", e)
+
+    def _redis_failed(self, operation: str, error: Exception):
+        self.redis_errors += 1
+        logger.warning(f"Response cache {operation} failed, continuing without Redis: {str(error)}")
+
+    async def invalidate(self, tags: Iterable[str], publish: bool = True):
+        """Drop every entry carrying one of `tags` here and in Redis.
+
+        `publish` tells the other workers to drop their in-process copies;
+        callers reacting to a Postgres NOTIFY skip it because every worker
+        receives the notification itself.
+        """
+        tags = set(tags)
+        if not tags:
+            return
+        self.invalidations += 1
+        self._drop_local(tags)
+        if self._redis is None:
+            return
+
+        # Bumping the generations first fails every write of a load that
+        # began before this point; entries written earlier are in the
+        # indexes read next.
+        index_keys = [_index_key(tag) for tag in tags]
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for tag in tags:
+                    pipe.incr(_generation_key(tag))
+                    pipe.expire(_generation_key(tag), int(self.ttl + self.stale_ttl))
+                for index_key in index_keys:
+                    pipe.zrange(index_key, 0, -1)
+                results = await pipe.execute()
+            members = results[2 * len(tags):]
+            keys = index_keys + [KEY_PREFIX + member.decode() for tag_members in members for member in tag_members]
+            for start in range(0, len(keys), DELETE_BATCH_SIZE):
+                await self._redis.delete(*keys[start:start + DELETE_BATCH_SIZE])
+            if publish:
+                await self._redis.publish(INVALIDATION_CHANNEL, orjson.dumps(sorted(tags)))
+        except RedisError as e:
+            self._redis_failed("invalidate", e)
+
+    def _drop_local(self, tags: Iterable[str]):
+        tags = set(tags)
+        self._generation += 1
+        for key, (_, entry_tags) in self._l1.items():
+            if tags.intersection(entry_tags):
+                self._l1.pop(key)
+
+    def clear_local(self):
+        self._generation += 1
+        self._l1.clear()
+
+    async def start(self):
+        if self._redis is not None and self._listener_task is None:
+            self._listener_task = asyncio.ensure_future(self._listen())
+
+    async def stop(self):
+        if self._listener_task:
+            self._listener_task.cancel()
+            self._listener_task = None
+        if self._redis is not None:
+            await self._redis.connection_pool.disconnect()
+
+    async def _listen(self):
+        delay = 1
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                delay = 1
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._drop_local(orjson.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Response cache invalidation listener failed: {str(e)}")
+                # Messages published while disconnected are lost.
+                self.clear_local()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY_IN_SECONDS)
+            finally:
+                try:
+                    await pubsub.reset()
+                except Exception:
+                    pass
+
+    def stats(self) -> dict:
+        return {
+            **{f"l1_{name}": value for name, value in self._l1.stats().items()},
+            "l2_enabled": self._redis is not None,
+            "l2_hits": self.l2_hits,
+            "l2_misses": self.l2_misses,
+            "stale_hits": self.stale_hits,
+            "refreshes": self.refreshes,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "redis_errors": self.redis_errors,
+            "inflight": len(self._inflight),
+        }
+
+
+response_cache = ResponseCache()
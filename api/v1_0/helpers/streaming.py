@@ -0,0 +1,140 @@
+import codecs
+import json
+import os
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-seq")
+# Largest single array element held while waiting for the rest of it.
+REQUEST_ROW_MAX_SIZE = int(os.getenv("REQUEST_ROW_MAX_SIZE", 1024 * 1024))
+
+_WHITESPACE = " \t\n\r"
+_NUMBER_START = "-0123456789"
+_NUMBER_CHARS = "0123456789+-.eE"
+_decoder = json.JSONDecoder()
+
+
+async def iter_request_rows(request: Request) -> AsyncIterator[Tuple[object, object]]:
+    """Yield (row, error) pairs from a JSON array or an NDJSON body, both read as a stream."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+
+    if content_type not in NDJSON_MEDIA_TYPES:
+        async for row in _iter_json_array(request):
+            yield row
+        return
+
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line)
+    if buffer.strip():
+        yield _parse_line(buffer)
+
+
+def _parse_line(line: bytes):
+    try:
+        return json.loads(line), None
+    except ValueError as e:
+        return None, f"Invalid JSON: {e}"
+
+
+def _number_complete(buffer: str, position: int) -> bool:
+    # Whether something other than a number character follows the number.
+    end = position
+    while end < len(buffer) and buffer[end] in _NUMBER_CHARS:
+        end += 1
+    return end < len(buffer)
+
+
+class _ArrayScanner:
+    """Splits a JSON array into its elements as the text arrives.
+
+    Only the element being read is buffered. After the first element an
+    error cannot be resynchronized from, so it ends the scan.
+    """
+
+    def __init__(self):
+        self.state = "open"
+        self.rows = 0
+
+    def feed(self, buffer: str, position: int, eof: bool) -> Tuple[List[object], int, Optional[str]]:
+        rows = []
+        while self.state != "done":
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position == len(buffer):
+                break
+            char = buffer[position]
+            if self.state == "open":
+                if char != "[":
+                    return rows, position, "Request body must be a JSON array"
+                self.state = "first"
+                position += 1
+            elif self.state == "separator":
+                if char not in ",]":
+                    return rows, position, "Invalid JSON: expected ',' or ']' after a row"
+                self.state = "value" if char == "," else "done"
+                position += 1
+            elif self.state == "first" and char == "]":
+                self.state = "done"
+                position += 1
+            else:
+                if char in _NUMBER_START and not eof and not _number_complete(buffer, position):
+                    # The number may continue in the next chunk.
+                    break
+                try:
+                    row, end = _decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError as e:
+                    if eof:
+                        return rows, position, f"Invalid JSON: {e.msg}"
+                    if len(buffer) - position > REQUEST_ROW_MAX_SIZE:
+                        return rows, position, f"Invalid JSON or a row over {REQUEST_ROW_MAX_SIZE} characters"
+                    break
+                rows.append(row)
+                self.rows += 1
+                self.state = "separator"
+                position = end
+
+        if eof:
+            if self.state == "open":
+                return rows, position, "Request body is not valid JSON"
+            if self.state != "done":
+                return rows, position, "Invalid JSON: the body ends inside the array"
+            if buffer[position:].strip(_WHITESPACE):
+                return rows, position, "Invalid JSON: data after the array"
+        return rows, position, None
+
+
+async def _iter_json_array(request: Request) -> AsyncIterator[Tuple[object, Optional[str]]]:
+    scanner = _ArrayScanner()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    chunks = request.stream()
+    eof = False
+    while not eof:
+        try:
+            chunk = await chunks.__anext__()
+        except StopAsyncIteration:
+            chunk, eof = b"", True
+        try:
+            text = text_decoder.decode(chunk, final=eof)
+        except UnicodeDecodeError:
+            rows, error = [], "Request body is not valid UTF-8"
+        else:
+            buffer = buffer[position:] + text
+            rows, position, error = scanner.feed(buffer, 0, eof)
+
+        for row in rows:
+            yield row, None
+        if error:
+            # Nothing has been processed yet, so the whole request fails as
+            # before; later errors are reported against the next row.
+            if scanner.rows == 0:
+                raise HTTPException(status_code=400, detail=error)
+            yield None, error
+            return
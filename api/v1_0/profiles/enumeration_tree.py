@@ -0,0 +1,165 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import JSON, text
+
+from api.database.database import SessionLocal
+from api.database.notifications import current_change_version
+from api.v1_0.helpers.cache import TTLCache
+from api.v1_0.helpers.representation import DataVersion
+
+logger = logging.getLogger(__name__)
+
+PROFILES_PARENT_ID = 5
+SUBTREE_CACHE_SIZE = 256
+
+# One round trip for the whole forest. Depth and the root-to-node path come
+# from the recursion, so ancestors never need another query. Rows caught in
+# a parent cycle are unreachable from a root and left out.
+ENUMERATION_TREE_QUERY = text("""
+    WITH RECURSIVE tree AS (
+        SELECT id, parent_id, title, extra, status, 0 AS depth, ARRAY[id] AS path
+        FROM enumerations
+        WHERE parent_id IS NULL
+        UNION ALL
+        SELECT e.id, e.parent_id, e.title, e.extra, e.status, t.depth + 1, t.path || e.id
+        FROM enumerations e
+        JOIN tree t ON e.parent_id = t.id
+    )
+    SELECT id, parent_id, title, extra, status, depth, path FROM tree ORDER BY depth, id
+""").columns(extra=JSON)
+
+
+class EnumerationNode:
+    __slots__ = ("id", "parent_id", "title", "extra", "status", "depth", "path")
+
+    def __init__(self, id: int, parent_id: Optional[int], title: Optional[str], extra, status: Optional[bool],
+                 depth: int, path: Tuple[int, ...]):
+        self.id = id
+        self.parent_id = parent_id
+        self.title = title
+        self.extra = extra
+        self.status = status
+        self.depth = depth
+        self.path = path
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "parent_id": self.parent_id,
+            "title": self.title,
+            "extra": self.extra,
+            "status": self.status,
+            "depth": self.depth,
+        }
+
+
+class EnumerationTree:
+    """In-memory copy of `enumerations` with parent, children and ancestor paths, reloaded on NOTIFY."""
+
+    def __init__(self):
+        self.loaded = False
+        self._nodes: Dict[int, EnumerationNode] = {}
+        self._children: Dict[Optional[int], List[int]] = {}
+        self._subtrees = TTLCache(max_size=SUBTREE_CACHE_SIZE, default_ttl=float("inf"))
+        self._reload_task: Optional[asyncio.Task] = None
+        self._reload_again = False
+        self.version = DataVersion()
+        self.observers = []
+
+    async def load(self):
+        async with SessionLocal() as session:
+            rows = (await session.execute(ENUMERATION_TREE_QUERY)).all()
+            version = await current_change_version(session)
+
+        nodes = {}
+        children: Dict[Optional[int], List[int]] = {}
+        for id, parent_id, title, extra, status, depth, path in rows:
+            nodes[id] = EnumerationNode(id, parent_id, title, extra, status, depth, tuple(path))
+            children.setdefault(parent_id, []).append(id)
+        for siblings in children.values():
+            siblings.sort()
+
+        self._nodes = nodes
+        self._children = children
+        self._subtrees.clear()
+        self.version.advance(version)
+        self.loaded = True
+        logger.info(f"Enumeration tree loaded with {len(nodes)} nodes")
+        for observer in self.observers:
+            try:
+                observer()
+            except Exception as e:
+                logger.error(f"Enumeration tree observer {observer!r} failed: {str(e)}")
+
+    def on_notification(self, payload: str = None):
+        # A bulk change sends one notification per row; they all fold into
+        # a single reload. A change arriving mid-reload may not be in the
+        # rows already read, so it triggers one more.
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.ensure_future(self._reload())
+        else:
+            self._reload_again = True
+
+    async def _reload(self):
+        await asyncio.sleep(0)
+        while True:
+            self._reload_again = False
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error(f"Reloading the enumeration tree failed: {str(e)}")
+            if not self._reload_again:
+                break
+
+    def get(self, enumeration_id: int) -> Optional[EnumerationNode]:
+        return self._nodes.get(enumeration_id)
+
+    def parent(self, enumeration_id: int) -> Optional[EnumerationNode]:
+        node = self._nodes.get(enumeration_id)
+        return self._nodes.get(node.parent_id) if node and node.parent_id is not None else None
+
+    def children(self, enumeration_id: Optional[int], active_only: bool = True) -> List[EnumerationNode]:
+        nodes = (self._nodes[child_id] for child_id in self._children.get(enumeration_id, ()))
+        return [node for node in nodes if node.status or not active_only]
+
+    def ancestors(self, enumeration_id: int) -> List[EnumerationNode]:
+        node = self._nodes.get(enumeration_id)
+        return [self._nodes[ancestor_id] for ancestor_id in node.path[:-1]] if node else []
+
+    def _subtree(self, node: EnumerationNode, max_depth: Optional[int], active_only: bool) -> dict:
+        subtree = node.as_dict()
+        if max_depth is None or node.depth < max_depth:
+            subtree["children"] = [self._subtree(child, max_depth, active_only)
+                                   for child in self.children(node.id, active_only)]
+        else:
+            subtree["children"] = []
+        return subtree
+
+    def subtree_body(self, enumeration_id: Optional[int], depth: Optional[int] = None,
+                     active_only: bool = True) -> Optional[bytes]:
+        """Serialized subtree below `enumeration_id`, or the whole forest for None; None if unknown."""
+        key = (enumeration_id, depth, active_only)
+        body = self._subtrees.get(key)
+        if body is not None:
+            return body
+
+        if enumeration_id is None:
+            roots = self.children(None, active_only)
+            body = {"enumerations": [self._subtree(root, depth, active_only) for root in roots],
+                    "count": len(roots)}
+        else:
+            node = self._nodes.get(enumeration_id)
+            if node is None:
+                return None
+            max_depth = None if depth is None else node.depth + depth
+            body = self._subtree(node, max_depth, active_only)
+
+        body = orjson.dumps(body)
+        self._subtrees.set(key, body)
+        return body
+
+
+enumeration_tree = EnumerationTree()
@@ -1,10 +1,12 @@
 import logging
 from typing import List, Optional
-from fastapi import HTTPException, Query, Depends
+from fastapi import HTTPException, Query, Depends, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.sql import func
 
+from api.v1_0.profiles.enumeration_tree import enumeration_tree, PROFILES_PARENT_ID
 from api.v1_0.profiles.serializers import Profile, Profiles
 from api.v1_0.vendors.models import VendorInformation, Enumerations, Vendors
 
@@ -12,8 +14,16 @@ logger = logging.getLogger(__name__)
 
 
 async def get_profiles_handler(profile_handler: 'BaseProfile'):
+    if enumeration_tree.loaded:
+        profiles = [
+            Profile(id=node.id, title=node.title, extra=node.extra)
+            for node in enumeration_tree.children(PROFILES_PARENT_ID)
+        ]
+        return Profiles(profiles=profiles, count=len(profiles))
+
     db = profile_handler.db
-    query = select(Enumerations).filter(Enumerations.parent_id == 5).filter(Enumerations.status == True)
+    query = select(Enumerations).filter(Enumerations.parent_id == PROFILES_PARENT_ID).filter(
+        Enumerations.status == True)
     result = await db.execute(query)
     rows = result.scalars().all()
 
@@ -26,3 +36,29 @@ async def get_profiles_handler(profile_handler: 'BaseProfile'):
         for row in rows
     ]
     return Profiles(profiles=profiles, count=len(profiles))
+
+
+def _loaded_tree():
+    if not enumeration_tree.loaded:
+        raise HTTPException(status_code=503, detail="Enumerations are still loading")
+    return enumeration_tree
+
+
+async def get_enumeration_forest_handler(depth: Optional[int], active_only: bool):
+    return Response(content=_loaded_tree().subtree_body(None, depth, active_only), media_type="application/json")
+
+
+async def get_enumeration_subtree_handler(enumeration_id: int, depth: Optional[int], active_only: bool):
+    body = _loaded_tree().subtree_body(enumeration_id, depth, active_only)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Enumeration not found")
+    return Response(content=body, media_type="application/json")
+
+
+async def get_enumeration_ancestors_handler(enumeration_id: int):
+    tree = _loaded_tree()
+    node = tree.get(enumeration_id)
+    if node is None:
+        raise HTTPException(status_code=404, detail="Enumeration not found")
+    chain = [ancestor.as_dict() for ancestor in tree.ancestors(enumeration_id)] + [node.as_dict()]
+    return ORJSONResponse({"enumerations": chain, "count": len(chain)})
@@ -1,25 +1,89 @@
 import logging
+import os
 
-from fastapi import APIRouter
-from fastapi.params import Depends
-from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from fastapi import APIRouter, Query, Request
 from sqlalchemy.future import select
 
-from api.database.database import get_db
+from api.database.database import SessionLocal
 from api.v1_0.profiles.base_profile import BaseProfile
-from api.v1_0.profiles.profile_utils import get_profiles_handler
+from api.v1_0.helpers.representation import Representation, RepresentationSlot, conditional_response, not_modified
+from api.v1_0.helpers.response_cache import response_cache, cache_key, PROFILES_TAG
+from api.v1_0.profiles.enumeration_tree import enumeration_tree
+from api.v1_0.profiles.profile_utils import (
+    get_profiles_handler,
+    get_enumeration_forest_handler,
+    get_enumeration_subtree_handler,
+    get_enumeration_ancestors_handler
+)
 from api.v1_0.vendors.models import Enumerations
-from api.v1_0.profiles.serializers import Profile, Profiles
+from api.v1_0.profiles.serializers import Profile, Profiles, EnumerationForest, EnumerationSubtree, EnumerationChain
 
 profile_router = APIRouter(prefix="/v1/profiles", tags=["Profiles"])
 logger = logging.getLogger(__name__)
 
+PROFILE_REPRESENTATION_TTL_IN_SECONDS = int(os.getenv("PROFILE_REPRESENTATION_TTL_IN_SECONDS", 10 * 60))
+profiles_representation = RepresentationSlot(ttl=PROFILE_REPRESENTATION_TTL_IN_SECONDS)
+
+
+async def get_profiles_representation():
+    # The body is shared by every request waiting on it, so the load opens
+    # its own session instead of borrowing the first caller's.
+    async def load():
+        async with SessionLocal() as session:
+            profiles = await get_profiles_handler(BaseProfile(session))
+        return profiles.model_dump_json().encode()
+
+    async def build():
+        # Served from the enumeration tree once it is loaded; the shared
+        # cache only matters while a worker is still starting.
+        if enumeration_tree.loaded:
+            tag = enumeration_tree.version.tag
+            body = await load()
+            # A reload while the body was built leaves the tag unproven.
+            return Representation(body, tag if tag == enumeration_tree.version.tag else None)
+        return Representation(await response_cache.get(cache_key("profiles"), (PROFILES_TAG,), load))
+
+    return await profiles_representation.get(build)
+
 
 @profile_router.get('/', response_model=Profiles,
                          description='Get the profiles',
                          status_code=200)
 async def get_profiles(
-        db: AsyncSession = Depends(get_db),
+        request: Request,
+):
+    response = not_modified(request, enumeration_tree.version.tag if enumeration_tree.loaded else None)
+    if response is not None:
+        return response
+    representation = await get_profiles_representation()
+    return await conditional_response(request, representation)
+
+
+@profile_router.get('/enumerations', response_model=EnumerationForest,
+                    description='Get the whole enumeration tree, optionally cut at a depth',
+                    status_code=200)
+async def get_enumeration_forest(
+        depth: Optional[int] = Query(None, ge=0, description="levels below the roots, all when omitted"),
+        active_only: bool = Query(True),
 ):
-    profile_handler = BaseProfile(db)
-    return await get_profiles_handler(profile_handler)
+    return await get_enumeration_forest_handler(depth, active_only)
+
+
+@profile_router.get('/enumerations/{enumeration_id}', response_model=EnumerationSubtree,
+                    description='Get an enumeration with all of its descendants',
+                    status_code=200)
+async def get_enumeration_subtree(
+        enumeration_id: int,
+        depth: Optional[int] = Query(None, ge=0, description="levels below the enumeration, all when omitted"),
+        active_only: bool = Query(True),
+):
+    return await get_enumeration_subtree_handler(enumeration_id, depth, active_only)
+
+
+@profile_router.get('/enumerations/{enumeration_id}/ancestors', response_model=EnumerationChain,
+                    description='Get the chain from the root down to the enumeration itself',
+                    status_code=200)
+async def get_enumeration_ancestors(enumeration_id: int):
+    return await get_enumeration_ancestors_handler(enumeration_id)
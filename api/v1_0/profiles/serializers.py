@@ -11,3 +11,26 @@ class Profile(BaseModel):
 class Profiles(BaseModel):
     profiles: List[Profile]
     count: int
+
+
+class EnumerationItem(BaseModel):
+    id: int
+    parent_id: Optional[int]
+    title: Optional[str]
+    extra: Optional[dict]
+    status: Optional[bool]
+    depth: int
+
+
+class EnumerationSubtree(EnumerationItem):
+    children: List["EnumerationSubtree"]
+
+
+class EnumerationForest(BaseModel):
+    enumerations: List[EnumerationSubtree]
+    count: int
+
+
+class EnumerationChain(BaseModel):
+    enumerations: List[EnumerationItem]
+    count: int
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy.future import select
+
+from api.database.database import SessionLocal
+from api.database.notifications import current_change_version
+from api.v1_0.helpers.representation import DataVersion, Representation
+from api.v1_0.vendors.models import Enumerations, Vendors
+from api.v1_0.vendors.serializers import ActiveVendor, ActiveVendors
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_VENDOR_STATUS = 2
+
+
+def _active_vendor(vendor: Vendors, profile: Optional[Enumerations]) -> ActiveVendor:
+    return ActiveVendor(
+        vendor_id=vendor.vendor_id,
+        profile_id=vendor.profile_id,
+        profile_name=profile.title if profile else None,
+        working_time=vendor.working_times,
+        extra=vendor.extra,
+    )
+
+
+class ActiveVendorIndex:
+    """In-memory copy of active `vendors` rows, keyed by vendor_id and by profile_id."""
+
+    def __init__(self):
+        self.loaded = False
+        self._rows: Dict[int, ActiveVendor] = {}
+        self._by_vendor: Dict[int, Dict[int, None]] = {}
+        self._by_profile: Dict[int, Dict[int, None]] = {}
+        self._list_representation: Optional[Representation] = None
+        self._pending_ids = set()
+        self._pending_profiles = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        # Loads and refreshes apply one at a time, so an older result never
+        # overwrites a newer one.
+        self._lock = asyncio.Lock()
+        self.invalid_rows = 0
+        self.version = DataVersion()
+        self.observers = []
+
+    async def load(self):
+        async with self._lock:
+            async with SessionLocal() as session:
+                result = await session.execute(self._active_query().order_by(Vendors.id))
+                rows = result.all()
+                version = await current_change_version(session)
+
+            self._rows = {}
+            self._by_vendor = {}
+            self._by_profile = {}
+            self._put_rows(rows)
+            self._list_representation = None
+            self.version.advance(version)
+            self.loaded = True
+            self._notify_observers(None)
+        logger.info(f"Active vendor index loaded with {len(self._rows)} vendors")
+        # Changes notified while the query ran may be missing from its result.
+        self._schedule_flush()
+
+    def get_all_representation(self) -> Representation:
+        # Built on the first request after a change; conditional requests
+        # in between compare against the cached ETag only.
+        if self._list_representation is None:
+            vendors = [self._rows[row_id] for row_id in sorted(self._rows)]
+            body = ActiveVendors(vendors=vendors, count=len(vendors)).model_dump_json().encode()
+            self._list_representation = Representation(body, self.version.tag)
+        return self._list_representation
+
+    def get_by_vendor(self, vendor_id: int) -> List[ActiveVendor]:
+        return [self._rows[row_id] for row_id in self._by_vendor.get(vendor_id, ())]
+
+    def get_by_profile(self, profile_id: int) -> List[ActiveVendor]:
+        return [self._rows[row_id] for row_id in self._by_profile.get(profile_id, ())]
+
+    def rows(self) -> Dict[int, ActiveVendor]:
+        return self._rows
+
+    def on_vendor_notification(self, payload: str):
+        self._pending_ids.add(json.loads(payload)["id"])
+        self._schedule_flush()
+
+    def on_profile_notification(self, payload: str):
+        profile_id = json.loads(payload)["id"]
+        if not self.loaded or profile_id in self._by_profile:
+            self._pending_profiles.add(profile_id)
+            self._schedule_flush()
+
+    def on_reconnect(self):
+        return self.load()
+
+    def _schedule_flush(self):
+        # Notifications from one bulk statement arrive back to back; they are
+        # folded into a single refresh query on the next loop iteration. Ids
+        # that arrive before the first load or during a flush stay pending
+        # and are picked up once it finishes.
+        if self.loaded and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.ensure_future(self._flush())
+
+    async def _flush(self):
+        await asyncio.sleep(0)
+        while self._pending_ids or self._pending_profiles:
+            row_ids, self._pending_ids = self._pending_ids, set()
+            profile_ids, self._pending_profiles = self._pending_profiles, set()
+
+            for profile_id in profile_ids:
+                row_ids.update(self._by_profile.get(profile_id, ()))
+            if not row_ids:
+                continue
+
+            try:
+                await self._refresh(row_ids)
+            except Exception as e:
+                logger.error(f"Refreshing {len(row_ids)} active vendors failed, reloading: {str(e)}")
+                try:
+                    await self.load()
+                except Exception as e:
+                    # Kept pending for the flush after the next notification.
+                    logger.error(f"Reloading the active vendor index failed: {str(e)}")
+                    self._pending_ids.update(row_ids)
+                    self._pending_profiles.update(profile_ids)
+                    return
+
+    async def _refresh(self, row_ids: Iterable[int]):
+        row_ids = list(row_ids)
+        async with self._lock:
+            async with SessionLocal() as session:
+                result = await session.execute(self._active_query().filter(Vendors.id.in_(row_ids)))
+                rows = result.all()
+                version = await current_change_version(session)
+
+            for row_id in row_ids:
+                self._remove(row_id)
+            self._put_rows(rows)
+            self._list_representation = None
+            self.version.advance(version)
+            self._notify_observers(row_ids)
+
+    def _active_query(self):
+        return select(Vendors, Enumerations).join(
+            Enumerations, Enumerations.id == Vendors.profile_id, isouter=True
+        ).filter(Vendors.status == ACTIVE_VENDOR_STATUS)
+
+    def _put_rows(self, rows):
+        # A row the API model rejects, such as malformed working_times, is
+        # left out instead of failing the whole load.
+        for vendor, profile in rows:
+            try:
+                active_vendor = _active_vendor(vendor, profile)
+            except ValidationError as e:
+                self.invalid_rows += 1
+                logger.error(f"Skipping vendors row {vendor.id} in the active vendor index: {str(e)}")
+                continue
+            self._put(vendor.id, active_vendor)
+
+    def _put(self, row_id: int, vendor: ActiveVendor):
+        self._rows[row_id] = vendor
+        self._by_vendor.setdefault(vendor.vendor_id, {})[row_id] = None
+        if vendor.profile_id is not None:
+            self._by_profile.setdefault(vendor.profile_id, {})[row_id] = None
+
+    def _remove(self, row_id: int):
+        vendor = self._rows.pop(row_id, None)
+        if vendor is None:
+            return
+        for index, key in ((self._by_vendor, vendor.vendor_id), (self._by_profile, vendor.profile_id)):
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.pop(row_id, None)
+                if not bucket:
+                    del index[key]
+
+    def _notify_observers(self, row_ids: Optional[List[int]]):
+        # `row_ids` is None after a full load.
+        for observer in self.observers:
+            try:
+                observer(row_ids)
+            except Exception as e:
+                logger.error(f"Active vendor index observer {observer!r} failed: {str(e)}")
+
+
+active_vendor_index = ActiveVendorIndex()
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, BigInteger, ForeignKey, JSON, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, BigInteger, ForeignKey, JSON, Boolean, DateTime, func
 from sqlalchemy.orm import relationship
 
 from api.database.database import Base
@@ -15,7 +15,7 @@ class Enumerations(Base):
     status = Column(Boolean)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, onupdate=datetime.now)
-    deleted_at = Column(DateTime, onupdate=datetime.now)
+    deleted_at = Column(DateTime)
 
 
 class Vendors(Base):
@@ -29,7 +29,7 @@ class Vendors(Base):
     extra = Column(JSON)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, onupdate=datetime.now)
-    deleted_at = Column(DateTime, onupdate=datetime.now)
+    deleted_at = Column(DateTime)
     status = Column(Integer)
 
 
@@ -50,3 +50,19 @@ class VendorInformation(Base):
     city_name = Column(String)
     city_id = Column(Integer)
     user_id = Column(Integer)
+    deleted_at = Column(DateTime(timezone=True))
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+
+class CityVendorStats(Base):
+    __tablename__ = 'city_vendor_stats'
+
+    city_id = Column(Integer, primary_key=True)
+    city_name = Column(String)
+    vendor_count = Column(BigInteger, nullable=False, default=0)
+    active_count = Column(BigInteger, nullable=False, default=0)
+    purchase_count = Column(BigInteger, nullable=False, default=0)
+    products_count = Column(BigInteger, nullable=False, default=0)
+    sold_products = Column(BigInteger, nullable=False, default=0)
+    same_city_orders = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -0,0 +1,263 @@
+import asyncio
+import bisect
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import text
+
+from api.database.database import SessionLocal
+from api.v1_0.vendors.active_index import ActiveVendorIndex, active_vendor_index
+from api.v1_0.vendors.serializers import ActiveVendor
+
+logger = logging.getLogger(__name__)
+
+VENDOR_TIMEZONE = ZoneInfo(os.getenv("VENDOR_TIMEZONE", "Asia/Tehran"))
+
+MINUTES_PER_DAY = 24 * 60
+
+# Integer days in working_times follow the Iranian week: 0 is Saturday.
+IRANIAN_WEEK = ["saturday", "sunday", "monday", "tuesday", "wednesday", "thursday", "friday"]
+PERSIAN_DAY_NAMES = ["شنبه", "یکشنبه", "دوشنبه", "سه\u200cشنبه", "چهارشنبه", "پنجشنبه", "جمعه"]
+DAY_NUMBERS = {
+    **{name: (index + 5) % 7 for index, name in enumerate(IRANIAN_WEEK)},
+    **{name[:3]: (index + 5) % 7 for index, name in enumerate(IRANIAN_WEEK)},
+    **{name: (index + 5) % 7 for index, name in enumerate(PERSIAN_DAY_NAMES)},
+    **{name.replace("\u200c", ""): (index + 5) % 7 for index, name in enumerate(PERSIAN_DAY_NAMES)},
+    **{name.replace("\u200c", " "): (index + 5) % 7 for index, name in enumerate(PERSIAN_DAY_NAMES)},
+}
+
+DAY_KEYS = ("day", "weekday", "day_of_week", "week_day")
+START_KEYS = ("start", "from", "open", "start_time", "opens_at", "open_time")
+END_KEYS = ("end", "to", "close", "end_time", "closes_at", "close_time")
+RANGE_KEYS = ("times", "hours", "ranges", "intervals")
+
+_TIME = re.compile(r"^(\d{1,2}):(\d{2})(?::\d{2})?$")
+
+Intervals = Tuple[Tuple[int, int], ...]
+WeekSchedule = Tuple[Intervals, ...]  # indexed by datetime.weekday()
+
+
+def _first(entry: dict, keys: Tuple[str, ...]):
+    for key in keys:
+        if key in entry:
+            return entry[key]
+    return None
+
+
+def _weekday(value) -> Optional[int]:
+    if isinstance(value, int) and 0 <= value <= 6:
+        return (value + 5) % 7
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value.isdigit():
+            return _weekday(int(value))
+        return DAY_NUMBERS.get(value)
+    return None
+
+
+def _minutes(value) -> Optional[int]:
+    if isinstance(value, int) and 0 <= value <= MINUTES_PER_DAY:
+        return value
+    if isinstance(value, str):
+        match = _TIME.match(value.strip())
+        if match:
+            minutes = int(match.group(1)) * 60 + int(match.group(2))
+            if minutes <= MINUTES_PER_DAY:
+                return minutes
+    return None
+
+
+def _merge(intervals: List[Tuple[int, int]]) -> Intervals:
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return tuple(merged)
+
+
+def compile_working_times(working_times) -> WeekSchedule:
+    days: List[List[Tuple[int, int]]] = [[] for _ in range(7)]
+    for entry in working_times or ():
+        if not isinstance(entry, dict) or entry.get("closed") or entry.get("is_closed"):
+            continue
+        weekday = _weekday(_first(entry, DAY_KEYS))
+        if weekday is None:
+            continue
+
+        ranges = _first(entry, RANGE_KEYS)
+        for time_range in (ranges if isinstance(ranges, list) else [entry]):
+            if not isinstance(time_range, dict):
+                continue
+            start = _minutes(_first(time_range, START_KEYS))
+            end = _minutes(_first(time_range, END_KEYS))
+            if start is None or end is None or start == end:
+                continue
+            if end > start:
+                days[weekday].append((start, end))
+            else:
+                # Past midnight: the tail belongs to the next day.
+                days[weekday].append((start, MINUTES_PER_DAY))
+                days[(weekday + 1) % 7].append((0, end))
+
+    return tuple(_merge(intervals) for intervals in days)
+
+
+Timeline = Tuple[List[int], List[Tuple[int, ...]]]
+
+
+def _timeline(groups: Dict[Intervals, Set[int]]) -> Timeline:
+    # Breakpoints of one weekday and, for the segment starting at each, the
+    # sorted ids open throughout it. A vendor has a single set of merged
+    # hours per weekday, so its intervals never overlap or touch.
+    events: Dict[int, Tuple[List[Set[int]], List[Set[int]]]] = {}
+    for intervals, row_ids in groups.items():
+        for start, end in intervals:
+            events.setdefault(start, ([], []))[0].append(row_ids)
+            events.setdefault(end, ([], []))[1].append(row_ids)
+
+    breakpoints = [0]
+    open_sets: List[Tuple[int, ...]] = [()]
+    open_ids: Set[int] = set()
+    for minute in sorted(events):
+        opening, closing = events[minute]
+        for row_ids in closing:
+            open_ids -= row_ids
+        for row_ids in opening:
+            open_ids |= row_ids
+        if minute == breakpoints[-1]:
+            open_sets[-1] = tuple(sorted(open_ids))
+        else:
+            breakpoints.append(minute)
+            open_sets.append(tuple(sorted(open_ids)))
+    return breakpoints, open_sets
+
+
+class OpenNowEngine:
+    """Answers which active vendors are open at a given moment from compiled working times."""
+
+    def __init__(self, index: ActiveVendorIndex):
+        self.index = index
+        self._schedules: Dict[int, WeekSchedule] = {}
+        # Vendors sharing exactly the same hours on one weekday.
+        self._groups: List[Dict[Intervals, Set[int]]] = [{} for _ in range(7)]
+        # Rebuilt on the first query after a weekday changes.
+        self._timelines: List[Optional[Timeline]] = [None] * 7
+        self._cities: Dict[int, int] = {}
+        # Vendor ids whose city is to be read again; None for all of them.
+        self._pending_cities: Optional[Set[int]] = set()
+        self._city_task: Optional[asyncio.Task] = None
+
+    def on_index_change(self, row_ids: Optional[Iterable[int]]):
+        rows = self.index.rows()
+        if row_ids is None:
+            self._schedules = {}
+            self._groups = [{} for _ in range(7)]
+            self._timelines = [None] * 7
+            self._pending_cities = None
+            row_ids = list(rows)
+        elif self._pending_cities is not None:
+            self._pending_cities.update(rows[row_id].vendor_id for row_id in row_ids if row_id in rows)
+        for row_id in row_ids:
+            self._remove(row_id)
+            vendor = rows.get(row_id)
+            if vendor is not None:
+                self._add(row_id, compile_working_times(vendor.working_time))
+        self._schedule_city_load()
+
+    def _add(self, row_id: int, schedule: WeekSchedule):
+        self._schedules[row_id] = schedule
+        for weekday, intervals in enumerate(schedule):
+            if intervals:
+                self._groups[weekday].setdefault(intervals, set()).add(row_id)
+                self._timelines[weekday] = None
+
+    def _remove(self, row_id: int):
+        schedule = self._schedules.pop(row_id, None)
+        if schedule is None:
+            return
+        for weekday, intervals in enumerate(schedule):
+            row_ids = self._groups[weekday].get(intervals)
+            if row_ids is not None:
+                row_ids.discard(row_id)
+                if not row_ids:
+                    del self._groups[weekday][intervals]
+                self._timelines[weekday] = None
+
+    def _timeline(self, weekday: int) -> Timeline:
+        timeline = self._timelines[weekday]
+        if timeline is None:
+            timeline = self._timelines[weekday] = _timeline(self._groups[weekday])
+        return timeline
+
+    def open_at(self, at: datetime, city_id: Optional[int] = None,
+                profile_id: Optional[int] = None) -> List[ActiveVendor]:
+        local = at.astimezone(VENDOR_TIMEZONE) if at.tzinfo else at.replace(tzinfo=VENDOR_TIMEZONE)
+        minute = local.hour * 60 + local.minute
+
+        breakpoints, open_sets = self._timeline(local.weekday())
+        open_ids = open_sets[bisect.bisect_right(breakpoints, minute) - 1]
+
+        rows = self.index.rows()
+        vendors = [rows[row_id] for row_id in open_ids if row_id in rows]
+        if profile_id is not None:
+            vendors = [vendor for vendor in vendors if vendor.profile_id == profile_id]
+        if city_id is not None:
+            vendors = [vendor for vendor in vendors if self._cities.get(vendor.vendor_id) == city_id]
+        return vendors
+
+    async def load_cities(self, vendor_ids: Optional[Set[int]] = None):
+        if vendor_ids is None:
+            cities = {}
+            query_ids = list({vendor.vendor_id for vendor in self.index.rows().values()})
+        else:
+            cities = self._cities
+            query_ids = list(vendor_ids)
+        async with SessionLocal() as session:
+            result = await session.execute(text(
+                "SELECT DISTINCT ON (vendor_id) vendor_id, city_id FROM vendor_infos "
+                "WHERE vendor_id = ANY(:vendor_ids) AND city_id IS NOT NULL AND deleted_at IS NULL "
+                "ORDER BY vendor_id, id DESC"
+            ), {"vendor_ids": query_ids})
+            rows = result.all()
+        for vendor_id in query_ids:
+            cities.pop(vendor_id, None)
+        cities.update(rows)
+        self._cities = cities
+
+    def _schedule_city_load(self):
+        # Like the index flush: changes arriving while a load runs are read
+        # by the next pass of the same task.
+        if self._city_task is None or self._city_task.done():
+            self._city_task = asyncio.ensure_future(self._load_pending_cities())
+
+    async def _load_pending_cities(self):
+        await asyncio.sleep(0)
+        while self._pending_cities is None or self._pending_cities:
+            vendor_ids, self._pending_cities = self._pending_cities, set()
+            try:
+                await self.load_cities(vendor_ids)
+            except Exception as e:
+                # Kept pending for the load after the next index change.
+                logger.error(f"Loading vendor cities failed: {str(e)}")
+                if vendor_ids is None:
+                    self._pending_cities = None
+                elif self._pending_cities is not None:
+                    self._pending_cities.update(vendor_ids)
+                return
+
+    async def wait_for_cities(self):
+        if self._city_task is not None and not self._city_task.done():
+            await asyncio.shield(self._city_task)
+
+    def stop(self):
+        if self._city_task:
+            self._city_task.cancel()
+
+
+open_now_engine = OpenNowEngine(active_vendor_index)
@@ -1,25 +1,41 @@
 import logging
+from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Query, Request, Response, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.database.database import get_db
-from api.v1_0.vendors.serializers import AllVendors, SingleVendor, ActiveVendors, Message, VendorCreate, VendorUpdate
+from api.database.database import get_db, SessionLocal
+from api.database.replica import get_read_db, read_session_factory
+from api.v1_0.helpers.response_cache import response_cache, cache_key, vendor_tag, city_tag, VENDOR_INFOS_TAG
+from api.v1_0.helpers.streaming import iter_request_rows
+from api.v1_0.vendors.serializers import AllVendors, SingleVendor, ActiveVendors, Message, VendorCreate, VendorUpdate, \
+    BulkWriteResult, BulkUpdateResult, ImportJobStatus, ImportJobErrors, CityStats, AllCityStats, VendorBatch
 from api.v1_0.vendors.base_vendor import BaseVendor
+from api.v1_0.vendors.vendor_import import (
+    start_import_handler,
+    get_import_status_handler,
+    get_import_errors_handler
+)
 from api.v1_0.vendors.vendor_utils import (
     get_vendors_query,
     get_vendor_query,
+    get_vendors_batch_query,
+    VENDOR_BATCH_MAX_SIZE,
     get_vendors_search_query,
     get_vendors_by_city_query,
+    get_city_stats_query,
+    get_all_city_stats_query,
     get_active_vendors_query,
     get_active_vendor_by_id_query,
+    get_open_vendors_query,
     create_vendor_handler,
     create_vendors_multiple_handler,
     update_vendor_handler,
     update_vendors_multiple_handler,
     delete_vendor_handler,
     delete_vendors_multiple_handler,
-    delete_all_vendors_handler
+    delete_all_vendors_handler,
+    export_vendors_handler
 )
 
 vendor_router = APIRouter(prefix="/v1/vendors", tags=["Vendors"])
@@ -33,10 +49,13 @@ logger = logging.getLogger(__name__)
 async def get_vendors(
         limit: int = Query(10, ge=1, le=100),
         offset: int = Query(0, ge=0),
-        db: AsyncSession = Depends(get_db)
+        cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a previous page, "
+                                                          "takes precedence over offset"),
+        count_mode: str = Query("cached", enum=["cached", "estimate", "exact"]),
+        db: AsyncSession = Depends(get_read_db)
 ):
     vendor_handler = BaseVendor(db)
-    return await get_vendors_query(vendor_handler, limit, offset)
+    return await get_vendors_query(vendor_handler, limit, offset, cursor, count_mode)
 
 
 @vendor_router.get("/{vendor_id:int}", response_model=SingleVendor,
@@ -45,10 +64,26 @@ async def get_vendors(
                    status_code=200)
 async def get_vendor(
         vendor_id: int,
-        db: AsyncSession = Depends(get_db)
 ):
-    vendor_handler = BaseVendor(db)
-    return await get_vendor_query(vendor_handler, vendor_id)
+    # The first caller's load serves every request waiting on the key, so it
+    # must not borrow that request's session; vendor_loader has its own.
+    async def load():
+        vendor = await get_vendor_query(vendor_id)
+        return vendor.model_dump_json().encode()
+
+    body = await response_cache.get(cache_key("vendor", vendor_id=vendor_id),
+                                    (vendor_tag(vendor_id), VENDOR_INFOS_TAG), load)
+    return Response(content=body, media_type="application/json")
+
+
+@vendor_router.get("/batch", response_model=VendorBatch,
+                   description=f"Get up to {VENDOR_BATCH_MAX_SIZE} vendors by identifier in one request",
+                   response_description="The vendors found and the identifiers that were not",
+                   status_code=200)
+async def get_vendors_batch(
+        ids: List[int] = Query(..., description="repeat the parameter for every vendor identifier"),
+):
+    return await get_vendors_batch_query(ids)
 
 
 @vendor_router.get("/search", response_model=AllVendors,
@@ -57,31 +92,83 @@ async def get_vendor(
                    status_code=200)
 async def get_vendors_search(
         vendor_name: str = Query(None, description="the user can search english or persian name, both"),
-        db: AsyncSession = Depends(get_db)
+        limit: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = Query(None, description="next_cursor of a previous page, ranked mode only"),
+        mode: str = Query("ranked", enum=["ranked", "prefix"],
+                          description="ranked: substring match ordered by relevance, prefix: autocomplete"),
+        db: AsyncSession = Depends(get_read_db)
 ):
     vendor_handler = BaseVendor(db)
-    return await get_vendors_search_query(vendor_handler, vendor_name)
+    return await get_vendors_search_query(vendor_handler, vendor_name, limit, cursor, mode)
 
 
 @vendor_router.get("/city/{city_id}", response_model=AllVendors,
-                   description='Get vendors by the city identifier',
+                   description='Get vendors by the city identifier, ordered by vendor identifier',
                    status_code=200)
 async def get_single_by_city_id(
         city_id: int,
-        db: AsyncSession = Depends(get_db)
+        limit: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = Query(None, description="next_cursor of a previous page"),
+):
+    # Shared by every request waiting on the key, so it opens its own session.
+    async def load():
+        async with SessionLocal() as session:
+            response = await get_vendors_by_city_query(BaseVendor(session), city_id, limit, cursor)
+        return response.body
+
+    body = await response_cache.get(cache_key("city", city_id=city_id, limit=limit, cursor=cursor),
+                                    (city_tag(city_id), VENDOR_INFOS_TAG), load)
+    return Response(content=body, media_type="application/json")
+
+
+@vendor_router.get("/city/{city_id}/stats", response_model=CityStats,
+                   description='Vendor count, active count and summed purchase, product, sold product and '
+                               'same-city order counts of a city',
+                   status_code=200)
+async def get_city_stats(
+        city_id: int,
+        db: AsyncSession = Depends(get_read_db)
 ):
     vendor_handler = BaseVendor(db)
-    return await get_vendors_by_city_query(vendor_handler, city_id)
+    return await get_city_stats_query(vendor_handler, city_id)
+
+
+@vendor_router.get("/city-stats", response_model=AllCityStats,
+                   description='Per-city vendor aggregates for every city, largest first',
+                   status_code=200)
+async def get_all_city_stats(
+        db: AsyncSession = Depends(get_read_db)
+):
+    vendor_handler = BaseVendor(db)
+    return await get_all_city_stats_query(vendor_handler)
+
+
+@vendor_router.get("/export",
+                   description="Stream every vendor_infos row, or every vendors row with its profile, "
+                               "as NDJSON, CSV or XLSX",
+                   response_description="The exported file, sent in chunks",
+                   status_code=200)
+async def export_vendors(
+        request: Request,
+        dataset: str = Query("vendor_infos", enum=["vendor_infos", "vendors"]),
+        format: str = Query("ndjson", enum=["ndjson", "csv", "xlsx"]),
+        city_id: Optional[int] = Query(None, description="vendor_infos only"),
+        is_active: Optional[bool] = Query(None, description="vendor_infos only"),
+        status: Optional[int] = Query(None, description="vendors only, 2 is active"),
+):
+    return await export_vendors_handler(dataset, format, city_id, is_active, status,
+                                        session_factory=read_session_factory(request))
 
 
 @vendor_router.get('/active-qc-vendor-list', response_model=ActiveVendors,
                    description='Get all active vendors',
                    status_code=200)
 async def all_actives(
-        db: AsyncSession = Depends(get_db)
+        request: Request,
+        db: AsyncSession = Depends(get_read_db)
 ):
     vendor_handler = BaseVendor(db)
-    return await get_active_vendors_query(vendor_handler)
+    return await get_active_vendors_query(vendor_handler, request)
 
 
 @vendor_router.get('/active-qc-vendor-single', response_model=ActiveVendors,
@@ -90,12 +177,24 @@ async def all_actives(
 async def get_active_by_id(
         id: int,
         source: Optional[str] = Query(None, enum=["vendor", "profile"]),
-        db: AsyncSession = Depends(get_db)
+        db: AsyncSession = Depends(get_read_db)
 ):
     vendor_handler = BaseVendor(db)
     return await get_active_vendor_by_id_query(vendor_handler, id, source)
 
 
+@vendor_router.get('/open-now', response_model=ActiveVendors,
+                   description='Get the active vendors whose working times include the given moment',
+                   status_code=200)
+async def get_open_vendors(
+        at: Optional[datetime] = Query(None, description="ISO datetime, defaults to now; "
+                                                         "without an offset it is read as Tehran time"),
+        city_id: Optional[int] = Query(None),
+        profile_id: Optional[int] = Query(None),
+):
+    return await get_open_vendors_query(at, city_id, profile_id)
+
+
 @vendor_router.post("/add-to-qc", response_model=Message,
                     description="Create a new vendor whom want to connect to Quick Commerce in Basalam",
                     response_description="Success Message",
@@ -108,20 +207,63 @@ async def create_vendor(
     return await create_vendor_handler(vendor_handler, vendor_info)
 
 
-@vendor_router.post("/add-multiple-vendor-to-qc", response_model=Message,
-                    description="Add new vendors whom want to connect to Quick Commerce in Basalam",
-                    response_description="Success Message",
-                    status_code=201)
+@vendor_router.post("/add-multiple-vendor-to-qc", response_model=BulkWriteResult,
+                    description="Add new vendors whom want to connect to Quick Commerce in Basalam. "
+                                "Send a JSON array, or application/x-ndjson to stream large uploads",
+                    response_description="Per-row outcome of the bulk insert",
+                    status_code=201,
+                    openapi_extra={
+                        "requestBody": {
+                            "content": {
+                                "application/json": {
+                                    "schema": {"type": "array",
+                                               "items": {"$ref": "#/components/schemas/VendorCreate"}}
+                                },
+                                "application/x-ndjson": {
+                                    "schema": {"$ref": "#/components/schemas/VendorCreate"}
+                                },
+                            },
+                            "required": True,
+                        }
+                    })
 async def create_vendors_multiple(
-        vendor_infos: List[VendorCreate],
+        request: Request,
         db: AsyncSession = Depends(get_db)
 ):
     vendor_handler = BaseVendor(db)
-    return await create_vendors_multiple_handler(vendor_handler, vendor_infos)
+    return await create_vendors_multiple_handler(vendor_handler, iter_request_rows(request))
+
+
+@vendor_router.post("/import", response_model=ImportJobStatus,
+                    description="Upload a CSV or Excel sheet of vendors. Headers are the add-to-qc field names; "
+                                "rows are validated, staged with COPY and merged into the vendors by "
+                                "vendor_identifier in the background",
+                    response_description="The queued import job",
+                    status_code=202)
+async def import_vendors(
+        background_tasks: BackgroundTasks,
+        file: UploadFile = File(...),
+):
+    return await start_import_handler(file, background_tasks)
+
+
+@vendor_router.get("/import/{job_id}", response_model=ImportJobStatus,
+                   description="Progress of a vendor import",
+                   status_code=200)
+async def get_import_status(job_id: str):
+    return await get_import_status_handler(job_id)
+
+
+@vendor_router.get("/import/{job_id}/errors", response_model=ImportJobErrors,
+                   description="Rejected rows of a vendor import, indexed by spreadsheet row number",
+                   status_code=200)
+async def get_import_errors(job_id: str):
+    return await get_import_errors_handler(job_id)
 
 
 @vendor_router.put("/update-qc-vendor/{vendor_id}", response_model=Message,
-                   description="Update a specific vendor",
+                   description="Update a specific vendor. Omitted or null fields keep their value; with "
+                               "`version` set, the update fails with 409 if the vendor changed since",
                    response_description="Success Message",
                    status_code=200)
 async def update_vendor(
@@ -133,9 +275,11 @@ async def update_vendor(
     return await update_vendor_handler(vendor_handler, vendor_id, vendor_info)
 
 
-@vendor_router.put("/update-multiple-qc-vendor", response_model=Message,
-                   description="Update a specific vendors",
-                   response_description="Success Message",
+@vendor_router.put("/update-multiple-qc-vendor", response_model=BulkUpdateResult,
+                   description="Update vendors by vendor_identifier. Rows without a change are skipped; "
+                               "rows whose `version` is stale are reported as conflicts",
+                   response_description="Per-row outcome of the bulk update: updated, unchanged, not_found, "
+                                        "conflict or rejected",
                    status_code=200)
 async def update_vendors_multiple(
         vendor_infos: List[VendorUpdate],
@@ -157,9 +301,9 @@ async def delete_vendor(
     return await delete_vendor_handler(vendor_handler, vendor_id)
 
 
-@vendor_router.delete("/delete-multiple-qc-vendor", response_model=Message,
+@vendor_router.delete("/delete-multiple-qc-vendor", response_model=BulkWriteResult,
                       description="Delete a specific vendors",
-                      response_description="Success Message",
+                      response_description="Per-vendor outcome of the bulk delete",
                       status_code=200)
 async def delete_vendors_multiple(
         vendor_ids: List[int],
@@ -169,9 +313,9 @@ async def delete_vendors_multiple(
     return await delete_vendors_multiple_handler(vendor_handler, vendor_ids)
 
 
-@vendor_router.delete("/delete-all-qc-vendor", response_model=Message,
+@vendor_router.delete("/delete-all-qc-vendor", response_model=BulkWriteResult,
                       description="Delete all vendors",
-                      response_description="Success Message",
+                      response_description="Number of deleted vendors",
                       status_code=200)
 async def delete_all_vendors(
         db: AsyncSession = Depends(get_db)
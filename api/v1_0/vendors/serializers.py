@@ -2,6 +2,18 @@ from pydantic import BaseModel, field_validator
 from typing import Optional, List
 import re
 
+PHONE_NUMBER_PATTERN = re.compile(r"^09\d{9}$")
+PHONE_NUMBER_INVALID_MESSAGE = "شماره تلفن معتبر نمی‌باشد! باید با 09 شروع شود و 11 رقم باشد."
+PHONE_NUMBER_NOT_ASCII_MESSAGE = "شماره تلفن باید فقط شامل اعداد انگلیسی (0-9) باشد."
+PERSIAN_NAME_MIN_LENGTH = 6
+PERSIAN_NAME_MAX_LENGTH = 90
+PERSIAN_NAME_TOO_SHORT_MESSAGE = "در اسم فارسی یک غرفه، حروف نمیتوانند کمتر از ۶ کاراکتر باشند!"
+PERSIAN_NAME_TOO_LONG_MESSAGE = "در اسم فارسی یک غرفه، تعداد حروف نمیتواند از ۹۰ کاراکتر تخطی کند."
+ENGLISH_NAME_MIN_LENGTH = 3
+ENGLISH_NAME_MAX_LENGTH = 120
+ENGLISH_NAME_TOO_SHORT_MESSAGE = "در اسم انگلیسی یک غرفه، حروف نمیتوانند کمتر از ۳ کاراکتر باشند!"
+ENGLISH_NAME_TOO_LONG_MESSAGE = "در اسم انگلیسی یک غرفه، تعداد حروف نمیتواند از ۱۲۰ کاراکتر تخطی کند."
+
 
 class SingleVendor(BaseModel):
     vendor_identifier: Optional[int]
@@ -12,6 +24,7 @@ class SingleVendor(BaseModel):
     the_number_of_purchase: Optional[int]
     the_number_of_products: Optional[int]
     the_number_of_sold_products: Optional[int]
+    version: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -33,6 +46,13 @@ class ActiveVendors(BaseModel):
 class AllVendors(BaseModel):
     vendors: List[SingleVendor]
     count: int
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+class VendorBatch(BaseModel):
+    vendors: List[SingleVendor]
+    missing: List[int]
 
 
 class VendorCreate(BaseModel):
@@ -48,12 +68,11 @@ class VendorCreate(BaseModel):
     @field_validator('phone_number_of_owner')
     @classmethod
     def validate_phone_number(cls, value):
-        pattern = re.compile(r"^09\d{9}$")
-        if not re.match(pattern, value):
-            raise ValueError("شماره تلفن معتبر نمی‌باشد! باید با 09 شروع شود و 11 رقم باشد.")
+        if not re.match(PHONE_NUMBER_PATTERN, value):
+            raise ValueError(PHONE_NUMBER_INVALID_MESSAGE)
 
         if not value.isascii() or not value.isdigit():
-            raise ValueError("شماره تلفن باید فقط شامل اعداد انگلیسی (0-9) باشد.")
+            raise ValueError(PHONE_NUMBER_NOT_ASCII_MESSAGE)
 
         return value
 
@@ -61,11 +80,11 @@ class VendorCreate(BaseModel):
     @classmethod
     def validate_vendor_name_persian(cls, value):
         length_of_vendor_name_persian = len(value)
-        if length_of_vendor_name_persian < 6:
-            raise ValueError("در اسم فارسی یک غرفه، حروف نمیتوانند کمتر از ۶ کاراکتر باشند!")
+        if length_of_vendor_name_persian < PERSIAN_NAME_MIN_LENGTH:
+            raise ValueError(PERSIAN_NAME_TOO_SHORT_MESSAGE)
 
-        if length_of_vendor_name_persian > 90:
-            raise ValueError("در اسم فارسی یک غرفه، تعداد حروف نمیتواند از ۹۰ کاراکتر تخطی کند.")
+        if length_of_vendor_name_persian > PERSIAN_NAME_MAX_LENGTH:
+            raise ValueError(PERSIAN_NAME_TOO_LONG_MESSAGE)
 
         return value
 
@@ -73,11 +92,11 @@ class VendorCreate(BaseModel):
     @classmethod
     def validate_vendor_name_english(cls, value):
         length_of_vendor_name_english = len(value)
-        if length_of_vendor_name_english < 3:
-            raise ValueError("در اسم انگلیسی یک غرفه، حروف نمیتوانند کمتر از ۳ کاراکتر باشند!")
+        if length_of_vendor_name_english < ENGLISH_NAME_MIN_LENGTH:
+            raise ValueError(ENGLISH_NAME_TOO_SHORT_MESSAGE)
 
-        if length_of_vendor_name_english > 120:
-            raise ValueError("در اسم انگلیسی یک غرفه، تعداد حروف نمیتواند از ۱۲۰ کاراکتر تخطی کند.")
+        if length_of_vendor_name_english > ENGLISH_NAME_MAX_LENGTH:
+            raise ValueError(ENGLISH_NAME_TOO_LONG_MESSAGE)
 
         return value
 
@@ -91,7 +110,75 @@ class VendorUpdate(BaseModel):
     the_number_of_purchase: Optional[int]
     the_number_of_products: Optional[int]
     the_number_of_sold_products: Optional[int]
+    # The version last read; the update is rejected if the vendor changed since.
+    version: Optional[int] = None
 
 
 class Message(BaseModel):
     message: str
+
+
+class RowError(BaseModel):
+    index: int
+    error: str
+
+
+class BulkWriteResult(BaseModel):
+    message: str
+    succeeded: int
+    failed: int
+    errors: List[RowError]
+
+
+class RowOutcome(BaseModel):
+    index: int
+    vendor_identifier: Optional[int]
+    outcome: str
+    version: Optional[int] = None
+
+
+class BulkUpdateResult(BulkWriteResult):
+    updated: int
+    unchanged: int
+    not_found: int
+    conflicts: int
+    outcomes: List[RowOutcome]
+
+
+class ImportJobStatus(BaseModel):
+    job_id: str
+    status: str
+    filename: Optional[str]
+    processed_rows: int
+    valid_rows: int
+    failed_rows: int
+    inserted: int
+    updated: int
+    error: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+class ImportJobErrors(BaseModel):
+    job_id: str
+    failed_rows: int
+    errors: List[RowError]
+
+
+class CityStats(BaseModel):
+    city_id: int
+    city_name: Optional[str]
+    vendor_count: int
+    active_count: int
+    purchase_count: int
+    products_count: int
+    sold_products: int
+    same_city_orders: int
+
+    class Config:
+        from_attributes = True
+
+
+class AllCityStats(BaseModel):
+    cities: List[CityStats]
+    count: int
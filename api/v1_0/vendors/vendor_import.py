@@ -0,0 +1,380 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+from fastapi import BackgroundTasks, HTTPException, UploadFile
+from sqlalchemy import JSON, text
+
+from api.database.database import engine
+from api.v1_0.helpers.response_cache import response_cache, VENDOR_INFOS_TAG
+from api.v1_0.vendors.serializers import (
+    ImportJobStatus,
+    ImportJobErrors,
+    RowError,
+    PHONE_NUMBER_INVALID_MESSAGE,
+    PHONE_NUMBER_NOT_ASCII_MESSAGE,
+    PERSIAN_NAME_MIN_LENGTH,
+    PERSIAN_NAME_MAX_LENGTH,
+    PERSIAN_NAME_TOO_SHORT_MESSAGE,
+    PERSIAN_NAME_TOO_LONG_MESSAGE,
+    ENGLISH_NAME_MIN_LENGTH,
+    ENGLISH_NAME_MAX_LENGTH,
+    ENGLISH_NAME_TOO_SHORT_MESSAGE,
+    ENGLISH_NAME_TOO_LONG_MESSAGE,
+)
+from api.v1_0.vendors.vendor_utils import vendor_count_cache
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = int(os.getenv("VENDOR_IMPORT_CHUNK_SIZE", 20000))
+IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("VENDOR_IMPORT_MAX_REPORTED_ERRORS", 10000))
+IMPORT_JOB_RETENTION_IN_SECONDS = int(os.getenv("VENDOR_IMPORT_JOB_RETENTION_IN_SECONDS", 24 * 60 * 60))
+
+# Spreadsheet header -> (vendor_infos column, type). Headers use the
+# VendorCreate field names so a sheet matches the add-to-qc payload.
+IMPORT_COLUMNS = {
+    "vendor_identifier": ("vendor_id", "integer"),
+    "vendor_name_persian": ("vendor_persian_name", "text"),
+    "vendor_name_english": ("vendor_english_name", "text"),
+    "phone_number_of_owner": ("vendor_phone_number", "text"),
+    "is_active": ("is_active", "boolean"),
+    "the_number_of_purchase": ("purchase_count", "integer"),
+    "the_number_of_products": ("products_count", "integer"),
+    "the_number_of_sold_products": ("sold_products", "integer"),
+    "same_city_orders": ("same_city_orders", "integer"),
+    "vendor_url": ("vendor_url", "text"),
+    "city_name": ("city_name", "text"),
+    "city_id": ("city_id", "integer"),
+    "user_id": ("user_id", "integer"),
+}
+REQUIRED_HEADERS = ("vendor_identifier", "vendor_name_persian", "vendor_name_english", "phone_number_of_owner")
+
+STAGING_TABLE = "vendor_infos_import"
+STAGING_COLUMNS = ["row_number"] + [column for column, _ in IMPORT_COLUMNS.values()]
+
+IMPORT_EXTENSIONS = (".csv", ".xls", ".xlsx")
+
+TRUE_VALUES = {"1", "true", "yes", "y", "بله"}
+FALSE_VALUES = {"0", "false", "no", "n", "خیر"}
+
+
+class ImportJob:
+    def __init__(self, filename: Optional[str], job_id: Optional[str] = None):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.status = "pending"
+        self.filename = filename
+        self.processed_rows = 0
+        self.valid_rows = 0
+        self.failed_rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.error: Optional[str] = None
+        self.errors: List[RowError] = []
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Errors not yet written to vendor_import_jobs.
+        self._unsaved_errors: List[RowError] = []
+
+    @classmethod
+    def from_row(cls, row) -> "ImportJob":
+        job = cls(row.filename, job_id=row.job_id)
+        for field in ("status", "processed_rows", "valid_rows", "failed_rows", "inserted", "updated", "error",
+                      "started_at", "finished_at"):
+            setattr(job, field, getattr(row, field))
+        job.errors = [RowError(**error) for error in getattr(row, "errors", None) or ()]
+        return job
+
+    def fail_rows(self, errors: List[Tuple[int, str]]):
+        self.failed_rows += len(errors)
+        room = IMPORT_MAX_REPORTED_ERRORS - len(self.errors)
+        reported = [RowError(index=index, error=error) for index, error in errors[:max(room, 0)]]
+        self.errors.extend(reported)
+        self._unsaved_errors.extend(reported)
+
+    async def save(self):
+        # Progress goes to Postgres so the status and error routes answer
+        # from any worker, not only the one running the import. Errors are
+        # appended, never rewritten.
+        errors = json.dumps([error.model_dump() for error in self._unsaved_errors])
+        async with engine.begin() as connection:
+            await connection.execute(
+                text(
+                    "UPDATE vendor_import_jobs SET status = :status, processed_rows = :processed_rows, "
+                    "valid_rows = :valid_rows, failed_rows = :failed_rows, inserted = :inserted, "
+                    "updated = :updated, error = :error, started_at = :started_at, finished_at = :finished_at, "
+                    "errors = errors || CAST(:errors AS jsonb) WHERE job_id = :job_id"
+                ),
+                {
+                    "job_id": self.job_id,
+                    "status": self.status,
+                    "processed_rows": self.processed_rows,
+                    "valid_rows": self.valid_rows,
+                    "failed_rows": self.failed_rows,
+                    "inserted": self.inserted,
+                    "updated": self.updated,
+                    "error": self.error,
+                    "started_at": self.started_at,
+                    "finished_at": self.finished_at,
+                    "errors": errors,
+                },
+            )
+        self._unsaved_errors = []
+
+    def status_model(self) -> ImportJobStatus:
+        return ImportJobStatus(
+            job_id=self.job_id,
+            status=self.status,
+            filename=self.filename,
+            processed_rows=self.processed_rows,
+            valid_rows=self.valid_rows,
+            failed_rows=self.failed_rows,
+            inserted=self.inserted,
+            updated=self.updated,
+            error=self.error,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+        )
+
+    def errors_model(self) -> ImportJobErrors:
+        return ImportJobErrors(job_id=self.job_id, failed_rows=self.failed_rows, errors=self.errors)
+
+
+IMPORT_JOB_COLUMNS = ("job_id, status, filename, processed_rows, valid_rows, failed_rows, inserted, updated, error, "
+               "started_at, finished_at")
+
+
+async def create_import_job(filename: Optional[str]) -> ImportJob:
+    job = ImportJob(filename)
+    async with engine.begin() as connection:
+        await connection.execute(
+            text("DELETE FROM vendor_import_jobs WHERE created_at < now() - make_interval(secs => :retention)"),
+            {"retention": IMPORT_JOB_RETENTION_IN_SECONDS},
+        )
+        await connection.execute(
+            text("INSERT INTO vendor_import_jobs (job_id, status, filename) VALUES (:job_id, :status, :filename)"),
+            {"job_id": job.job_id, "status": job.status, "filename": job.filename},
+        )
+    return job
+
+
+async def get_import_job(job_id: str, with_errors: bool = False) -> Optional[ImportJob]:
+    columns = f"{IMPORT_JOB_COLUMNS}, errors" if with_errors else IMPORT_JOB_COLUMNS
+    query = text(f"SELECT {columns} FROM vendor_import_jobs "
+                 "WHERE job_id = :job_id AND created_at >= now() - make_interval(secs => :retention)")
+    if with_errors:
+        query = query.columns(errors=JSON)
+    async with engine.connect() as connection:
+        row = (await connection.execute(
+            query, {"job_id": job_id, "retention": IMPORT_JOB_RETENTION_IN_SECONDS}
+        )).first()
+    return ImportJob.from_row(row) if row is not None else None
+
+
+def read_chunks(path: str, filename: str) -> Iterator[pd.DataFrame]:
+    read_options = {"dtype": str, "keep_default_na": False}
+    if filename.lower().endswith((".xls", ".xlsx")):
+        # Excel readers cannot stream; the sheet is read once and then
+        # validated and copied in chunks like a CSV.
+        frame = pd.read_excel(path, **read_options)
+        for start in range(0, len(frame), IMPORT_CHUNK_SIZE):
+            yield frame.iloc[start:start + IMPORT_CHUNK_SIZE]
+        return
+
+    yield from pd.read_csv(path, chunksize=IMPORT_CHUNK_SIZE, encoding="utf-8-sig", **read_options)
+
+
+def validate_chunk(frame: pd.DataFrame) -> Tuple[List[tuple], List[Tuple[int, str]]]:
+    frame = frame.rename(columns=lambda header: str(header).strip())
+    missing = [header for header in REQUIRED_HEADERS if header not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    row_numbers = frame.index.to_series() + 2  # 1-based, after the header row
+    problems = pd.Series("", index=frame.index)
+
+    def flag(mask: pd.Series, message: str):
+        problems[mask] = problems[mask] + message + " "
+
+    values = {}
+    for header, (column, column_type) in IMPORT_COLUMNS.items():
+        raw = frame[header].astype(str).str.strip() if header in frame.columns else pd.Series("", index=frame.index)
+        empty = raw == ""
+        if column_type == "integer":
+            numbers = pd.to_numeric(raw.where(~empty), errors="coerce")
+            whole = numbers.notna() & (numbers % 1 == 0)
+            flag(~empty & ~whole, f"{header}: not an integer.")
+            values[column] = numbers.where(whole).astype("Int64")
+        elif column_type == "boolean":
+            lowered = raw.str.lower()
+            flag(~empty & ~lowered.isin(TRUE_VALUES | FALSE_VALUES), f"{header}: not a boolean.")
+            values[column] = lowered.map(lambda value: True if value in TRUE_VALUES else (
+                False if value in FALSE_VALUES else None))
+        else:
+            values[column] = raw.where(~empty)
+
+    flag(values["vendor_id"].isna(), "vendor_identifier: required.")
+
+    phone = frame["phone_number_of_owner"].astype(str).str.strip()
+    bad_phone = ~phone.str.fullmatch(r"09\d{9}")
+    flag(bad_phone, PHONE_NUMBER_INVALID_MESSAGE)
+    flag(~bad_phone & ~phone.str.fullmatch(r"[0-9]+"), PHONE_NUMBER_NOT_ASCII_MESSAGE)
+
+    persian_length = frame["vendor_name_persian"].astype(str).str.strip().str.len()
+    flag(persian_length < PERSIAN_NAME_MIN_LENGTH, PERSIAN_NAME_TOO_SHORT_MESSAGE)
+    flag(persian_length > PERSIAN_NAME_MAX_LENGTH, PERSIAN_NAME_TOO_LONG_MESSAGE)
+
+    english_length = frame["vendor_name_english"].astype(str).str.strip().str.len()
+    flag(english_length < ENGLISH_NAME_MIN_LENGTH, ENGLISH_NAME_TOO_SHORT_MESSAGE)
+    flag(english_length > ENGLISH_NAME_MAX_LENGTH, ENGLISH_NAME_TOO_LONG_MESSAGE)
+
+    invalid = problems != ""
+    errors = list(zip(row_numbers[invalid].tolist(), problems[invalid].str.strip().tolist()))
+
+    valid = pd.DataFrame({"row_number": row_numbers, **values})[~invalid]
+    valid = valid.astype(object).where(valid.notna(), None)
+    return list(valid.itertuples(index=False, name=None)), errors
+
+
+async def run_import(job: ImportJob, path: str):
+    job.status = "running"
+    job.started_at = time.time()
+    await job.save()
+    chunks = read_chunks(path, job.filename or path)
+    try:
+        async with engine.connect() as connection:
+            raw_connection = await connection.get_raw_connection()
+            driver = raw_connection.driver_connection
+            async with driver.transaction():
+                column_definitions = ", ".join(
+                    f"{column} {column_type}" for column, column_type in IMPORT_COLUMNS.values()
+                )
+                await driver.execute(
+                    f"CREATE TEMP TABLE {STAGING_TABLE} (row_number integer, {column_definitions}) ON COMMIT DROP"
+                )
+
+                while True:
+                    frame = await asyncio.to_thread(next, chunks, None)
+                    if frame is None:
+                        break
+                    records, errors = await asyncio.to_thread(validate_chunk, frame)
+                    if records:
+                        await driver.copy_records_to_table(STAGING_TABLE, records=records, columns=STAGING_COLUMNS)
+                    job.processed_rows += len(frame)
+                    job.valid_rows += len(records)
+                    job.fail_rows(errors)
+                    await job.save()
+
+                job.status = "merging"
+                await job.save()
+                job.updated, job.inserted = await driver.fetchrow(_merge_statement())
+        job.status = "completed"
+        vendor_count_cache.invalidate()
+        await response_cache.invalidate([VENDOR_INFOS_TAG])
+    except Exception as e:
+        logger.error(f"Vendor import {job.job_id} failed: {str(e)}")
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = time.time()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        try:
+            await job.save()
+        except Exception as e:
+            logger.error(f"Saving vendor import {job.job_id} failed: {str(e)}")
+
+    logger.info(f"Vendor import {job.job_id} {job.status}: {job.inserted} inserted, {job.updated} updated, "
+                f"{job.failed_rows} rejected")
+
+
+def _merge_statement() -> str:
+    # vendor_id is not unique in vendor_infos, so there is no ON CONFLICT
+    # target. One statement updates matching rows and inserts the rest; the
+    # last spreadsheet row wins when a vendor appears twice. A vendor whose
+    # rows are all soft-deleted comes back as a new row. As in the bulk
+    # update, a vendor whose merged values equal the stored ones is not
+    # written, and a changed vendor moves all its live rows to the version
+    # of its lowest id row plus one.
+    columns = [column for column, _ in IMPORT_COLUMNS.values()]
+    compared = [column for column in columns if column != "vendor_id"]
+    merged = ", ".join(f"COALESCE(s.{column}, v.{column})" for column in compared)
+    current = ", ".join(f"v.{column}" for column in compared)
+    updates = ", ".join(f"{column} = COALESCE(s.{column}, v.{column})" for column in compared)
+    column_list = ", ".join(columns)
+    source_list = ", ".join(f"s.{column}" for column in columns)
+    return f"""
+        WITH source AS (
+            SELECT DISTINCT ON (vendor_id) *
+            FROM {STAGING_TABLE}
+            ORDER BY vendor_id, row_number DESC
+        ),
+        canonical AS (
+            SELECT DISTINCT ON (v.vendor_id) v.vendor_id, v.version
+            FROM vendor_infos v
+            JOIN source s ON s.vendor_id = v.vendor_id
+            WHERE v.deleted_at IS NULL
+            ORDER BY v.vendor_id, v.id
+        ),
+        changed AS (
+            SELECT DISTINCT s.vendor_id
+            FROM source s
+            JOIN vendor_infos v ON v.vendor_id = s.vendor_id AND v.deleted_at IS NULL
+            WHERE ({merged}) IS DISTINCT FROM ({current})
+        ),
+        updated AS (
+            UPDATE vendor_infos v SET {updates}, version = c.version + 1
+            FROM source s
+            JOIN canonical c ON c.vendor_id = s.vendor_id
+            WHERE v.vendor_id = s.vendor_id
+              AND v.deleted_at IS NULL
+              AND s.vendor_id IN (SELECT vendor_id FROM changed)
+            RETURNING v.vendor_id
+        ),
+        inserted AS (
+            INSERT INTO vendor_infos ({column_list})
+            SELECT {source_list} FROM source s
+            WHERE NOT EXISTS (SELECT 1 FROM canonical c WHERE c.vendor_id = s.vendor_id)
+            RETURNING 1
+        )
+        SELECT (SELECT count(*) FROM updated), (SELECT count(*) FROM inserted)
+    """
+
+
+def _save_upload(upload: UploadFile, suffix: str) -> str:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as target:
+        shutil.copyfileobj(upload.file, target, length=1024 * 1024)
+        return target.name
+
+
+async def start_import_handler(upload: UploadFile, background_tasks: BackgroundTasks):
+    suffix = os.path.splitext(upload.filename or "")[1].lower()
+    if suffix not in IMPORT_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"File must be one of {', '.join(IMPORT_EXTENSIONS)}")
+
+    path = await asyncio.to_thread(_save_upload, upload, suffix)
+    job = await create_import_job(upload.filename)
+    background_tasks.add_task(run_import, job, path)
+    return job.status_model()
+
+
+async def get_import_status_handler(job_id: str):
+    job = await get_import_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job.status_model()
+
+
+async def get_import_errors_handler(job_id: str):
+    job = await get_import_job(job_id, with_errors=True)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job.errors_model()
@@ -1,130 +1,333 @@
 import logging
-from typing import List, Optional
-from fastapi import HTTPException, Query
+import os
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from fastapi import HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import ARRAY, Integer, any_, bindparam, distinct, text, union
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
 from sqlalchemy.future import select
 from sqlalchemy.sql import func
 
-from api.database.database import get_db
-from api.v1_0.vendors.models import VendorInformation, Enumerations, Vendors
+from api.database.database import get_db, SessionLocal
+from api.v1_0.helpers.dataloader import DataLoader
+from api.v1_0.helpers.export_writers import EXPORT_WRITERS
+from api.v1_0.helpers.persian import normalize_persian, escape_like
+from api.v1_0.helpers.representation import conditional_response, not_modified
+from api.v1_0.helpers.response_cache import response_cache, vendor_tag, city_tag, VENDOR_INFOS_TAG
+from api.v1_0.helpers.pagination import CachedCount, encode_cursor, decode_cursor, cursor_int
+from api.v1_0.vendors.active_index import active_vendor_index
+from api.v1_0.vendors.open_now import open_now_engine
+from api.v1_0.vendors.models import VendorInformation, Enumerations, Vendors, CityVendorStats
 from api.v1_0.vendors.serializers import AllVendors, SingleVendor, ActiveVendors, ActiveVendor, Message, VendorCreate, \
-    VendorUpdate
+    VendorUpdate, BulkWriteResult, BulkUpdateResult, RowError, RowOutcome, CityStats, AllCityStats
 
 logger = logging.getLogger(__name__)
 
+VENDOR_COUNT_TTL_IN_SECONDS = int(os.getenv("VENDOR_COUNT_TTL_IN_SECONDS", 60))
+vendor_count_cache = CachedCount(ttl=VENDOR_COUNT_TTL_IN_SECONDS)
+
+EXPORT_CHUNK_SIZE = int(os.getenv("VENDOR_EXPORT_CHUNK_SIZE", 2000))
+
+VENDOR_BATCH_MAX_SIZE = int(os.getenv("VENDOR_BATCH_MAX_SIZE", 500))
+
+BULK_CHUNK_SIZE = int(os.getenv("VENDOR_BULK_CHUNK_SIZE", 5000))
+BULK_MAX_REPORTED_ERRORS = int(os.getenv("VENDOR_BULK_MAX_REPORTED_ERRORS", 1000))
+
+VENDOR_COPY_COLUMNS = [
+    "vendor_id",
+    "vendor_persian_name",
+    "vendor_english_name",
+    "vendor_phone_number",
+    "is_active",
+    "purchase_count",
+    "products_count",
+    "sold_products",
+]
+
+
+# Column order matches SINGLE_VENDOR_FIELDS, the keys of a SingleVendor.
+SINGLE_VENDOR_COLUMNS = (
+    VendorInformation.vendor_id,
+    VendorInformation.vendor_persian_name,
+    VendorInformation.vendor_english_name,
+    VendorInformation.vendor_phone_number,
+    VendorInformation.is_active,
+    VendorInformation.purchase_count,
+    VendorInformation.products_count,
+    VendorInformation.sold_products,
+    VendorInformation.version,
+)
+SINGLE_VENDOR_FIELDS = (
+    "vendor_identifier",
+    "vendor_name_persian",
+    "vendor_name_english",
+    "phone_number_of_owner",
+    "is_active",
+    "the_number_of_purchase",
+    "the_number_of_products",
+    "the_number_of_sold_products",
+    "version",
+)
+
+
+def vendor_dicts(rows) -> List[dict]:
+    return [dict(zip(SINGLE_VENDOR_FIELDS, row)) for row in rows]
+
+
+def vendor_list_response(vendors: List[dict], count: int, next_cursor: Optional[str] = None,
+                         prev_cursor: Optional[str] = None) -> ORJSONResponse:
+    # Rows come straight from typed columns, so the AllVendors response_model
+    # is documentation only and the body is not validated a second time.
+    return ORJSONResponse({
+        "vendors": vendors,
+        "count": count,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    })
+
+
+async def get_vendors_count(db: AsyncSession, count_mode: str) -> int:
+    async def exact_count():
+        result = await db.execute(
+            select(func.count()).select_from(VendorInformation).filter(VendorInformation.deleted_at.is_(None))
+        )
+        return result.scalar()
+
+    if count_mode == "exact":
+        return await exact_count()
+
+    if count_mode == "estimate":
+        result = await db.execute(
+            text("SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = 'vendor_infos'::regclass")
+        )
+        estimate = result.scalar()
+        if estimate:
+            return estimate
+
+    return await vendor_count_cache.get(exact_count)
 
-async def get_vendors_query(vendor_handler: 'BaseVendor', limit: int, offset: int):
+
+async def get_vendors_query(vendor_handler: 'BaseVendor', limit: int, offset: int,
+                            cursor: Optional[str] = None, count_mode: str = "cached"):
     db = vendor_handler.db
-    count_query = select(func.count(func.distinct(VendorInformation.id))).select_from(VendorInformation)
-    count_result = await db.execute(count_query)
-    total_count = count_result.scalar()
+    total_count = await get_vendors_count(db, count_mode)
+
+    query = select(VendorInformation.id, *SINGLE_VENDOR_COLUMNS).filter(VendorInformation.deleted_at.is_(None))
+    backwards = False
+    if cursor:
+        position = decode_cursor(cursor)
+        if "after" in position:
+            query = query.filter(VendorInformation.id > cursor_int(position, "after")).order_by(VendorInformation.id)
+        elif "before" in position:
+            backwards = True
+            query = query.filter(VendorInformation.id < cursor_int(position, "before")).order_by(
+                VendorInformation.id.desc())
+        else:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    else:
+        query = query.order_by(VendorInformation.id).offset(offset)
 
-    query = (
-        select(VendorInformation)
-        .distinct(VendorInformation.id)
-        .order_by(VendorInformation.id)
-        .limit(limit)
-        .offset(offset)
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = None
+    prev_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = encode_cursor(after=rows[-1][0])
+        if (has_more and backwards) or (not backwards and (cursor or offset)):
+            prev_cursor = encode_cursor(before=rows[0][0])
+
+    return vendor_list_response(
+        vendor_dicts(row[1:] for row in rows), total_count, next_cursor=next_cursor, prev_cursor=prev_cursor
     )
-    result = await db.execute(query)
-    rows = result.scalars().all()
 
-    vendors = [
-        SingleVendor(
-            vendor_identifier=vendor.vendor_id,
-            vendor_name_english=vendor.vendor_english_name,
-            vendor_name_persian=vendor.vendor_persian_name,
-            phone_number_of_owner=vendor.vendor_phone_number,
-            the_number_of_products=vendor.products_count,
-            the_number_of_purchase=vendor.purchase_count,
-            the_number_of_sold_products=vendor.sold_products,
-            is_active=vendor.is_active,
+
+async def load_vendors_by_ids(vendor_ids: List[int]) -> Dict[int, dict]:
+    # Batches mix lookups from many requests, so they run on their own session.
+    async with SessionLocal() as session:
+        result = await session.execute(
+            select(*SINGLE_VENDOR_COLUMNS)
+            .distinct(VendorInformation.vendor_id)
+            .filter(VendorInformation.vendor_id == any_(bindparam("vendor_ids", vendor_ids, type_=ARRAY(Integer))))
+            .filter(VendorInformation.deleted_at.is_(None))
+            .order_by(VendorInformation.vendor_id, VendorInformation.id)
         )
-        for vendor in rows
-    ]
+        return {vendor["vendor_identifier"]: vendor for vendor in vendor_dicts(result.all())}
 
-    return AllVendors(count=total_count, vendors=vendors)
 
+vendor_loader = DataLoader(load_vendors_by_ids, max_batch_size=VENDOR_BATCH_MAX_SIZE)
 
-async def get_vendor_query(vendor_handler: 'BaseVendor', vendor_id: int):
-    db = vendor_handler.db
-    query = (
-        select(VendorInformation)
-        .filter(VendorInformation.vendor_id == vendor_id)
-    )
-    result = await db.execute(query)
-    row = result.scalar()
 
-    if not row:
+async def get_vendor_query(vendor_id: int):
+    vendor = await vendor_loader.load(vendor_id)
+    if not vendor:
         raise HTTPException(status_code=404, detail="Vendor not found")
 
-    return SingleVendor(
-        vendor_identifier=row.vendor_id,
-        vendor_name_english=row.vendor_english_name,
-        vendor_name_persian=row.vendor_persian_name,
-        phone_number_of_owner=row.vendor_phone_number,
-        the_number_of_products=row.products_count,
-        the_number_of_purchase=row.purchase_count,
-        the_number_of_sold_products=row.sold_products,
-        is_active=row.is_active,
-    )
+    return SingleVendor(**vendor)
 
 
-async def get_vendors_search_query(vendor_handler: 'BaseVendor', vendor_name: Optional[str]):
-    db = vendor_handler.db
+async def get_vendors_batch_query(vendor_ids: List[int]):
+    # The lookups go through vendor_loader, which batches them with those of
+    # concurrent requests on the primary, so the route takes no session.
+    unique_ids = list(dict.fromkeys(vendor_ids))
+    if len(unique_ids) > VENDOR_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {VENDOR_BATCH_MAX_SIZE} vendor ids per request")
+
+    vendors = await vendor_loader.load_many(unique_ids)
+    return ORJSONResponse({
+        "vendors": [vendor for vendor in vendors if vendor],
+        "missing": [vendor_id for vendor_id, vendor in zip(unique_ids, vendors) if not vendor],
+    })
+
+
+def _normalized_names():
+    return func.qc_normalize(VendorInformation.vendor_persian_name), func.qc_normalize(
+        VendorInformation.vendor_english_name)
+
+
+async def _search_ranked(db: AsyncSession, term: str, limit: int, cursor: Optional[str]):
+    persian_name, english_name = _normalized_names()
+    pattern = f"%{escape_like(term)}%"
+    rank = func.greatest(
+        func.similarity(persian_name, term),
+        func.similarity(english_name, term),
+    ).label("rank")
+    matches = (
+        select(VendorInformation.id.label("id"), rank)
+        .filter(persian_name.like(pattern) | english_name.like(pattern))
+        .filter(VendorInformation.deleted_at.is_(None))
+        .subquery()
+    )
+
     query = (
-        select(VendorInformation)
-        .filter(VendorInformation.vendor_persian_name.ilike(f"%{vendor_name}%")
-                | VendorInformation.vendor_english_name.ilike(f"%{vendor_name}%"))
+        select(matches.c.id, matches.c.rank, *SINGLE_VENDOR_COLUMNS)
+        .select_from(VendorInformation)
+        .join(matches, matches.c.id == VendorInformation.id)
     )
-    results = await db.execute(query)
-    rows = results.scalars().all()
+    if cursor:
+        position = decode_cursor(cursor)
+        last_id = cursor_int(position, "after")
+        try:
+            last_rank = float(position["rank"])
+        except (KeyError, ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(
+            (matches.c.rank < last_rank) | ((matches.c.rank == last_rank) & (matches.c.id > last_id))
+        )
+    query = query.order_by(matches.c.rank.desc(), matches.c.id).limit(limit + 1)
 
-    vendors = [
-        SingleVendor(
-            vendor_identifier=vendor.vendor_id,
-            vendor_name_english=vendor.vendor_english_name,
-            vendor_name_persian=vendor.vendor_persian_name,
-            phone_number_of_owner=vendor.vendor_phone_number,
-            the_number_of_products=vendor.products_count,
-            the_number_of_purchase=vendor.purchase_count,
-            the_number_of_sold_products=vendor.sold_products,
-            is_active=vendor.is_active,
+    result = await db.execute(query)
+    rows = result.all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rank=rows[-1][1], after=rows[-1][0])
+    return [row[2:] for row in rows], next_cursor
+
+
+async def _search_prefix(db: AsyncSession, term: str, limit: int):
+    # Each branch is a range scan over its own `COLLATE "C"` index, so the cost
+    # depends on `limit` and not on how many names share the prefix.
+    upper_bound = term + chr(0x10FFFF)
+    branches = []
+    for name in _normalized_names():
+        name = name.collate("C")
+        branches.append(
+            select(VendorInformation.id)
+            .filter(name >= term, name < upper_bound, VendorInformation.deleted_at.is_(None))
+            .order_by(name, VendorInformation.id)
+            .limit(limit)
         )
-        for vendor in rows
-    ]
+    ids = union(*branches).subquery()
+
+    query = (
+        select(*SINGLE_VENDOR_COLUMNS)
+        .filter(VendorInformation.id.in_(select(ids.c.id)))
+        .order_by(func.least(*[name.collate("C") for name in _normalized_names()]), VendorInformation.id)
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    return result.all()
 
-    return AllVendors(count=len(vendors), vendors=vendors)
+
+async def get_vendors_search_query(vendor_handler: 'BaseVendor', vendor_name: Optional[str], limit: int = 20,
+                                   cursor: Optional[str] = None, mode: str = "ranked"):
+    db = vendor_handler.db
+    term = normalize_persian(vendor_name or "")
+    if not term:
+        raise HTTPException(status_code=400, detail="vendor_name must not be empty")
+
+    next_cursor = None
+    if mode == "prefix":
+        rows = await _search_prefix(db, term, limit)
+    else:
+        rows, next_cursor = await _search_ranked(db, term, limit, cursor)
+
+    vendors = vendor_dicts(rows)
+    return vendor_list_response(vendors, len(vendors), next_cursor=next_cursor)
 
 
-async def get_vendors_by_city_query(vendor_handler: 'BaseVendor', city_id: int):
+async def get_vendors_by_city_query(vendor_handler: 'BaseVendor', city_id: int, limit: int = 20,
+                                    cursor: Optional[str] = None):
     db = vendor_handler.db
     query = (
-        select(VendorInformation)
+        select(*SINGLE_VENDOR_COLUMNS)
         .distinct(VendorInformation.vendor_id)
-        .filter(VendorInformation.city_id == city_id)
+        .filter(VendorInformation.city_id == city_id, VendorInformation.deleted_at.is_(None))
+        .order_by(VendorInformation.vendor_id, VendorInformation.id)
     )
-    result = await db.execute(query)
-    rows = result.scalars().all()
+    if cursor:
+        query = query.filter(VendorInformation.vendor_id > cursor_int(decode_cursor(cursor), "after"))
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.all()
 
-    vendors = [
-        SingleVendor(
-            vendor_identifier=vendor.vendor_id,
-            vendor_name_english=vendor.vendor_english_name,
-            vendor_name_persian=vendor.vendor_persian_name,
-            phone_number_of_owner=vendor.vendor_phone_number,
-            the_number_of_products=vendor.products_count,
-            the_number_of_purchase=vendor.purchase_count,
-            the_number_of_sold_products=vendor.sold_products,
-            is_active=vendor.is_active,
-        )
-        for vendor in rows
-    ]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(after=rows[-1][0])
+
+    # Distinct vendors, as listed. city_vendor_stats counts vendor_infos rows,
+    # which overcounts vendors with several rows in the city. This walks the
+    # (city_id, vendor_id, id) index, and the body is cached.
+    count = (await db.execute(
+        select(func.count(distinct(VendorInformation.vendor_id)))
+        .filter(VendorInformation.city_id == city_id, VendorInformation.deleted_at.is_(None))
+    )).scalar()
+    return vendor_list_response(vendor_dicts(rows), count, next_cursor=next_cursor)
+
+
+async def get_city_stats_query(vendor_handler: 'BaseVendor', city_id: int):
+    stats = await vendor_handler.db.get(CityVendorStats, city_id)
+    if not stats:
+        raise HTTPException(status_code=404, detail="City not found")
+    return CityStats.model_validate(stats)
+
+
+async def get_all_city_stats_query(vendor_handler: 'BaseVendor'):
+    result = await vendor_handler.db.execute(
+        select(CityVendorStats)
+        .filter(CityVendorStats.vendor_count > 0)
+        .order_by(CityVendorStats.vendor_count.desc(), CityVendorStats.city_id)
+    )
+    cities = [CityStats.model_validate(row) for row in result.scalars().all()]
+    return AllCityStats(cities=cities, count=len(cities))
 
-    return AllVendors(vendors=vendors, count=len(vendors))
 
+async def get_active_vendors_query(vendor_handler: 'BaseVendor', request: Request):
+    if active_vendor_index.loaded:
+        response = not_modified(request, active_vendor_index.version.tag)
+        if response is not None:
+            return response
+        return await conditional_response(request, active_vendor_index.get_all_representation())
 
-async def get_active_vendors_query(vendor_handler: 'BaseVendor'):
     db = vendor_handler.db
     query = select(Vendors, Enumerations).join(
         Enumerations, Enumerations.id == Vendors.profile_id, isouter=True
@@ -147,6 +350,15 @@ async def get_active_vendors_query(vendor_handler: 'BaseVendor'):
 
 
 async def get_active_vendor_by_id_query(vendor_handler: 'BaseVendor', id: int, source: Optional[str]):
+    if active_vendor_index.loaded and source in ("vendor", "profile"):
+        if source == "vendor":
+            vendors = active_vendor_index.get_by_vendor(id)
+        else:
+            vendors = active_vendor_index.get_by_profile(id)
+        if not vendors:
+            raise HTTPException(status_code=404, detail="Vendor not found")
+        return ActiveVendors(vendors=vendors, count=len(vendors))
+
     db = vendor_handler.db
     query = select(Vendors, Enumerations).join(
         Enumerations, Vendors.profile_id == Enumerations.id, isouter=True
@@ -178,29 +390,435 @@ async def get_active_vendor_by_id_query(vendor_handler: 'BaseVendor', id: int, s
     return ActiveVendors(vendors=vendors, count=len(vendors))
 
 
+def _export_query(dataset: str, city_id: Optional[int], is_active: Optional[bool], status: Optional[int]):
+    if dataset == "vendors":
+        query = (
+            select(
+                Vendors.id,
+                Vendors.vendor_id,
+                Vendors.profile_id,
+                Enumerations.title.label("profile_name"),
+                Vendors.working_times,
+                Vendors.start_date,
+                Vendors.extra,
+                Vendors.status,
+            )
+            .join(Enumerations, Enumerations.id == Vendors.profile_id, isouter=True)
+            .order_by(Vendors.id)
+        )
+        if status is not None:
+            query = query.filter(Vendors.status == status)
+        return query
+
+    query = (
+        select(*VendorInformation.__table__.columns)
+        .filter(VendorInformation.deleted_at.is_(None))
+        .order_by(VendorInformation.id)
+    )
+    if city_id is not None:
+        query = query.filter(VendorInformation.city_id == city_id)
+    if is_active is not None:
+        query = query.filter(VendorInformation.is_active == is_active)
+    return query
+
+
+async def export_vendors_handler(dataset: str, export_format: str, city_id: Optional[int] = None,
+                                 is_active: Optional[bool] = None, status: Optional[int] = None,
+                                 session_factory: sessionmaker = SessionLocal):
+    query = _export_query(dataset, city_id, is_active, status)
+    writer = EXPORT_WRITERS[export_format]([column.name for column in query.selected_columns])
+
+    async def stream():
+        # A session of its own: the request's session is closed as soon as
+        # the handler returns, long before the last chunk is sent.
+        async with session_factory() as session:
+            result = await session.stream(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+            yield writer.header()
+            async for rows in result.partitions():
+                yield writer.rows(rows)
+            yield writer.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type=writer.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{writer.extension}"'},
+    )
+
+
+async def get_open_vendors_query(at: Optional[datetime], city_id: Optional[int], profile_id: Optional[int]):
+    if not active_vendor_index.loaded:
+        raise HTTPException(status_code=503, detail="Active vendors are still loading")
+
+    vendors = open_now_engine.open_at(at or datetime.now(timezone.utc), city_id, profile_id)
+    return ActiveVendors(vendors=vendors, count=len(vendors))
+
+
 async def create_vendor_handler(vendor_handler: 'BaseVendor', vendor_info: VendorCreate):
     return Message(message="Vendor created successfully")
 
 
-async def create_vendors_multiple_handler(vendor_handler: 'BaseVendor', vendor_infos: List[VendorCreate]):
-    return Message(message="Multiple vendors created successfully")
+async def get_driver_connection(db: AsyncSession):
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    return raw_connection.driver_connection
+
+
+def _vendor_record(vendor_info: VendorCreate) -> tuple:
+    return (
+        vendor_info.vendor_identifier,
+        vendor_info.vendor_name_persian,
+        vendor_info.vendor_name_english,
+        vendor_info.phone_number_of_owner,
+        vendor_info.is_active,
+        vendor_info.the_number_of_purchase,
+        vendor_info.the_number_of_products,
+        vendor_info.the_number_of_sold_products,
+    )
+
+
+def _row_error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in error.errors())
+    return str(error)
+
+
+class _BulkReport:
+    def __init__(self):
+        self.succeeded = 0
+        self.failed = 0
+        self.errors: List[RowError] = []
+
+    def fail(self, index: int, error: str):
+        self.failed += 1
+        if len(self.errors) < BULK_MAX_REPORTED_ERRORS:
+            self.errors.append(RowError(index=index, error=error))
+
+    def result(self, message: str) -> BulkWriteResult:
+        return BulkWriteResult(message=message, succeeded=self.succeeded, failed=self.failed, errors=self.errors)
+
+
+async def _copy_vendor_chunk(connection, chunk: List[Tuple[int, tuple]], report: _BulkReport):
+    try:
+        async with connection.transaction():
+            await connection.copy_records_to_table(
+                "vendor_infos",
+                records=[record for _, record in chunk],
+                columns=VENDOR_COPY_COLUMNS,
+            )
+        report.succeeded += len(chunk)
+        vendor_count_cache.adjust(len(chunk))
+        await response_cache.invalidate(vendor_tag(record[0]) for _, record in chunk)
+    except Exception as e:
+        logger.error(f"COPY of {len(chunk)} vendors starting at row {chunk[0][0]} failed: {str(e)}")
+        for index, _ in chunk:
+            report.fail(index, f"Chunk rejected by the database: {str(e)}")
+
+
+async def create_vendors_multiple_handler(vendor_handler: 'BaseVendor',
+                                          vendor_rows: AsyncIterator[Tuple[object, Optional[str]]]):
+    connection = await get_driver_connection(vendor_handler.db)
+    report = _BulkReport()
+    chunk: List[Tuple[int, tuple]] = []
+
+    index = -1
+    async for row, parse_error in vendor_rows:
+        index += 1
+        if parse_error:
+            report.fail(index, parse_error)
+            continue
+        try:
+            vendor_info = VendorCreate.model_validate(row)
+        except (ValidationError, ValueError, TypeError) as e:
+            report.fail(index, _row_error_message(e))
+            continue
+
+        chunk.append((index, _vendor_record(vendor_info)))
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            await _copy_vendor_chunk(connection, chunk, report)
+            chunk = []
+
+    if chunk:
+        await _copy_vendor_chunk(connection, chunk, report)
+
+    logger.info(f"Bulk vendor insert finished: {report.succeeded} inserted, {report.failed} failed")
+    return report.result("Multiple vendors created successfully")
+
+
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+NOT_FOUND = "not_found"
+CONFLICT = "conflict"
+REJECTED = "rejected"
+
+# VendorUpdate field -> (vendor_infos column, array type). A None field
+# keeps the stored value.
+VENDOR_UPDATE_COLUMNS = {
+    "vendor_name_persian": ("vendor_persian_name", "text"),
+    "vendor_name_english": ("vendor_english_name", "text"),
+    "phone_number_of_owner": ("vendor_phone_number", "text"),
+    "is_active": ("is_active", "boolean"),
+    "the_number_of_purchase": ("purchase_count", "integer"),
+    "the_number_of_products": ("products_count", "integer"),
+    "the_number_of_sold_products": ("sold_products", "integer"),
+}
+
+
+def _bulk_update_statement() -> str:
+    # One round trip per chunk. The payload arrives as parallel arrays; rows
+    # whose merged values equal the stored ones are filtered out before the
+    # UPDATE, so a no-op row writes no tuple, WAL or index entry and fires no
+    # trigger. The live rows of every vendor are locked first, in id order,
+    # and the lowest id row carries the version the caller compares against,
+    # as it is the one every read returns. Once any row of a vendor changes,
+    # all its live rows move to that version plus one, so they never drift.
+    columns = [column for column, _ in VENDOR_UPDATE_COLUMNS.values()]
+    merged = ", ".join(f"COALESCE(s.{column}, v.{column})" for column in columns)
+    current = ", ".join(f"v.{column}" for column in columns)
+    updates = ", ".join(f"{column} = COALESCE(s.{column}, v.{column})" for column in columns)
+    arrays = ", ".join(f"${position}::{array_type}[]" for position, (_, array_type)
+                       in enumerate(VENDOR_UPDATE_COLUMNS.values(), start=4))
+    return f"""
+        WITH source AS (
+            SELECT * FROM unnest($1::int[], $2::int[], $3::int[], {arrays})
+                AS s(ordinal, vendor_id, expected_version, {", ".join(columns)})
+        ),
+        locked AS (
+            SELECT id, vendor_id, version
+            FROM vendor_infos
+            WHERE vendor_id = ANY($2::int[]) AND deleted_at IS NULL
+            ORDER BY id
+            FOR UPDATE
+        ),
+        canonical AS (
+            SELECT DISTINCT ON (vendor_id) vendor_id, version
+            FROM locked
+            ORDER BY vendor_id, id
+        ),
+        changed AS (
+            SELECT DISTINCT s.vendor_id
+            FROM source s
+            JOIN canonical c ON c.vendor_id = s.vendor_id
+            JOIN vendor_infos v ON v.vendor_id = s.vendor_id AND v.deleted_at IS NULL
+            WHERE (s.expected_version IS NULL OR s.expected_version = c.version)
+              AND ({merged}) IS DISTINCT FROM ({current})
+        ),
+        updated AS (
+            UPDATE vendor_infos v SET {updates}, version = c.version + 1
+            FROM source s
+            JOIN canonical c ON c.vendor_id = s.vendor_id
+            WHERE v.vendor_id = s.vendor_id
+              AND v.deleted_at IS NULL
+              AND s.vendor_id IN (SELECT vendor_id FROM changed)
+            RETURNING v.vendor_id, v.city_id, v.version
+        ),
+        changes AS (
+            SELECT vendor_id, array_agg(DISTINCT city_id) AS city_ids, max(version) AS version
+            FROM updated
+            GROUP BY vendor_id
+        )
+        SELECT s.ordinal, c.version AS current_version, u.version AS new_version, u.city_ids
+        FROM source s
+        LEFT JOIN canonical c ON c.vendor_id = s.vendor_id
+        LEFT JOIN changes u ON u.vendor_id = s.vendor_id
+    """
+
+
+BULK_UPDATE_STATEMENT = _bulk_update_statement()
+
+
+class _BulkUpdateReport(_BulkReport):
+    def __init__(self):
+        super().__init__()
+        self.counts = {UPDATED: 0, UNCHANGED: 0, NOT_FOUND: 0, CONFLICT: 0}
+        self.outcomes: List[RowOutcome] = []
+
+    def record(self, index: int, vendor_id: Optional[int], outcome: str, version: Optional[int] = None,
+               error: Optional[str] = None):
+        self.outcomes.append(RowOutcome(index=index, vendor_identifier=vendor_id, outcome=outcome, version=version))
+        if outcome in (UPDATED, UNCHANGED):
+            self.succeeded += 1
+        else:
+            self.fail(index, error or outcome)
+        if outcome in self.counts:
+            self.counts[outcome] += 1
+
+    def result(self, message: str) -> BulkUpdateResult:
+        self.outcomes.sort(key=lambda outcome: outcome.index)
+        return BulkUpdateResult(
+            message=message,
+            succeeded=self.succeeded,
+            failed=self.failed,
+            errors=sorted(self.errors, key=lambda error: error.index),
+            updated=self.counts[UPDATED],
+            unchanged=self.counts[UNCHANGED],
+            not_found=self.counts[NOT_FOUND],
+            conflicts=self.counts[CONFLICT],
+            outcomes=self.outcomes,
+        )
+
+
+async def _update_vendor_chunk(connection, chunk: List[Tuple[int, int, VendorUpdate]], report: _BulkUpdateReport):
+    arrays = [[index for index, _, _ in chunk], [vendor_id for _, vendor_id, _ in chunk],
+              [vendor_info.version for _, _, vendor_info in chunk]]
+    for field in VENDOR_UPDATE_COLUMNS:
+        arrays.append([getattr(vendor_info, field) for _, _, vendor_info in chunk])
+
+    try:
+        async with connection.transaction():
+            rows = await connection.fetch(BULK_UPDATE_STATEMENT, *arrays)
+    except Exception as e:
+        logger.error(f"Updating {len(chunk)} vendors starting at row {chunk[0][0]} failed: {str(e)}")
+        for index, vendor_id, _ in chunk:
+            report.record(index, vendor_id, REJECTED, error=f"Chunk rejected by the database: {str(e)}")
+        return
+
+    requests = {index: (vendor_id, vendor_info) for index, vendor_id, vendor_info in chunk}
+    tags = []
+    for row in rows:
+        vendor_id, vendor_info = requests[row["ordinal"]]
+        if row["current_version"] is None:
+            report.record(row["ordinal"], vendor_id, NOT_FOUND, error="Vendor not found")
+        elif row["new_version"] is not None:
+            report.record(row["ordinal"], vendor_id, UPDATED, row["new_version"])
+            tags.append(vendor_tag(vendor_id))
+            tags.extend(city_tag(city_id) for city_id in row["city_ids"] if city_id is not None)
+        elif vendor_info.version is not None and vendor_info.version != row["current_version"]:
+            report.record(row["ordinal"], vendor_id, CONFLICT, row["current_version"],
+                          error=f"Vendor changed concurrently, current version is {row['current_version']}")
+        else:
+            report.record(row["ordinal"], vendor_id, UNCHANGED, row["current_version"])
+    await response_cache.invalidate(tags)
 
 
 async def update_vendor_handler(vendor_handler: 'BaseVendor', vendor_id: int, vendor_info: VendorUpdate):
+    connection = await get_driver_connection(vendor_handler.db)
+    report = _BulkUpdateReport()
+    await _update_vendor_chunk(connection, [(0, vendor_id, vendor_info)], report)
+
+    outcome = report.outcomes[0]
+    if outcome.outcome == NOT_FOUND:
+        raise HTTPException(status_code=404, detail="Vendor not found")
+    if outcome.outcome == CONFLICT:
+        raise HTTPException(status_code=409, detail=report.errors[0].error)
+    if outcome.outcome == REJECTED:
+        raise HTTPException(status_code=500, detail="Vendor update failed")
+    if outcome.outcome == UNCHANGED:
+        return Message(message="Vendor is already up to date")
     return Message(message="Vendor updated successfully")
 
 
 async def update_vendors_multiple_handler(vendor_handler: 'BaseVendor', vendor_infos: List[VendorUpdate]):
-    return Message(message="Multiple vendors updated successfully")
+    connection = await get_driver_connection(vendor_handler.db)
+    report = _BulkUpdateReport()
+
+    # A vendor listed twice is updated from its last row, as in the import.
+    last_rows = {}
+    for index, vendor_info in enumerate(vendor_infos):
+        if vendor_info.vendor_identifier is None:
+            report.record(index, None, REJECTED, error="vendor_identifier is required")
+            continue
+        previous = last_rows.get(vendor_info.vendor_identifier)
+        if previous is not None:
+            report.record(previous, vendor_info.vendor_identifier, REJECTED,
+                          error=f"Superseded by row {index} for the same vendor_identifier")
+        last_rows[vendor_info.vendor_identifier] = index
+
+    rows = sorted((index, vendor_id, vendor_infos[index]) for vendor_id, index in last_rows.items())
+    for start in range(0, len(rows), BULK_CHUNK_SIZE):
+        await _update_vendor_chunk(connection, rows[start:start + BULK_CHUNK_SIZE], report)
+
+    logger.info(f"Bulk vendor update finished: {report.counts[UPDATED]} updated, {report.counts[UNCHANGED]} "
+                f"unchanged, {report.counts[NOT_FOUND]} not found, {report.counts[CONFLICT]} conflicts")
+    return report.result("Multiple vendors updated successfully")
+
+
+async def _soft_delete_vendors(connection, vendor_ids: List[int]) -> list:
+    # Deleted rows stay until the purger removes them; every read path skips
+    # them through the partial indexes on deleted_at IS NULL.
+    async with connection.transaction():
+        rows = await connection.fetch(
+            "UPDATE vendor_infos SET deleted_at = now() "
+            "WHERE vendor_id = ANY($1::int[]) AND deleted_at IS NULL RETURNING vendor_id, city_id",
+            vendor_ids,
+        )
+
+    vendor_count_cache.adjust(-len(rows))
+    cities = {row["city_id"] for row in rows if row["city_id"] is not None}
+    await response_cache.invalidate([vendor_tag(vendor_id) for vendor_id in {row["vendor_id"] for row in rows}] +
+                                    [city_tag(city_id) for city_id in cities])
+    return rows
 
 
 async def delete_vendor_handler(vendor_handler: 'BaseVendor', vendor_id: int):
+    connection = await get_driver_connection(vendor_handler.db)
+    if not await _soft_delete_vendors(connection, [vendor_id]):
+        raise HTTPException(status_code=404, detail="Vendor not found")
     return Message(message="Vendor deleted successfully")
 
 
 async def delete_vendors_multiple_handler(vendor_handler: 'BaseVendor', vendor_ids: List[int]):
-    return Message(message="Multiple vendors deleted successfully")
+    connection = await get_driver_connection(vendor_handler.db)
+    report = _BulkReport()
+    # Every unique id is deleted once and its outcome reported at each index
+    # it appears at in the request.
+    indexes: Dict[int, List[int]] = {}
+    for index, vendor_id in enumerate(vendor_ids):
+        indexes.setdefault(vendor_id, []).append(index)
+    unique_ids = list(indexes)
+
+    for start in range(0, len(unique_ids), BULK_CHUNK_SIZE):
+        chunk = unique_ids[start:start + BULK_CHUNK_SIZE]
+        try:
+            deleted_rows = await _soft_delete_vendors(connection, chunk)
+        except Exception as e:
+            logger.error(f"Deleting {len(chunk)} vendors failed: {str(e)}")
+            for vendor_id in chunk:
+                for index in indexes[vendor_id]:
+                    report.fail(index, f"Chunk rejected by the database: {str(e)}")
+            continue
+
+        deleted = {row["vendor_id"] for row in deleted_rows}
+        for vendor_id in chunk:
+            for index in indexes[vendor_id]:
+                if vendor_id in deleted:
+                    report.succeeded += 1
+                else:
+                    report.fail(index, "Vendor not found")
+
+    return report.result("Multiple vendors deleted successfully")
 
 
 async def delete_all_vendors_handler(vendor_handler: 'BaseVendor'):
-    return Message(message="All vendors deleted successfully")
+    connection = await get_driver_connection(vendor_handler.db)
+    report = _BulkReport()
+
+    # Each chunk resumes after the last id of the previous one, so rows that
+    # were already deleted are walked past once rather than once per chunk.
+    last_id = 0
+    while True:
+        async with connection.transaction():
+            deleted, scanned, last_id = await connection.fetchrow(
+                """
+                WITH chunk AS (
+                    SELECT id FROM vendor_infos
+                    WHERE id > $2 AND deleted_at IS NULL
+                    ORDER BY id
+                    LIMIT $1
+                ),
+                deleted AS (
+                    UPDATE vendor_infos SET deleted_at = now()
+                    WHERE id IN (SELECT id FROM chunk) AND deleted_at IS NULL
+                    RETURNING id
+                )
+                SELECT (SELECT count(*) FROM deleted), (SELECT count(*) FROM chunk), (SELECT max(id) FROM chunk)
+                """,
+                BULK_CHUNK_SIZE,
+                last_id,
+            )
+        report.succeeded += deleted
+        if scanned < BULK_CHUNK_SIZE:
+            break
+
+    vendor_count_cache.invalidate()
+    await response_cache.invalidate([VENDOR_INFOS_TAG])
+    return report.result("All vendors deleted successfully")
@@ -0,0 +1,79 @@
+import logging
+import re
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from starlette.responses import JSONResponse
+
+from app.token_cache import TokenCache
+
+logger = logging.getLogger(__name__)
+
+ACCESS_TOKEN_COOKIE = "accessToken"
+_BEARER_PREFIX = "Bearer "
+
+
+def compile_public_paths(prefixes: Iterable[str]) -> "re.Pattern":
+    return re.compile("|".join(re.escape(prefix) for prefix in prefixes))
+
+
+class AuthMiddleware:
+    """Pure ASGI middleware authenticating the accessToken cookie.
+
+    Requests under a public prefix pass straight through; everything else
+    needs a token accepted by `validate` (through the token cache) or gets
+    a 401 response.
+    """
+
+    def __init__(self, app, token_cache: TokenCache, validate: Callable[[str], Awaitable[Any]],
+                 public_paths: Iterable[str], cookie_name: str = ACCESS_TOKEN_COOKIE):
+        self.app = app
+        self.token_cache = token_cache
+        self.validate = validate
+        self._public = compile_public_paths(public_paths)
+        self._cookie = re.compile(rb"(?:^|[;,]\s*)" + re.escape(cookie_name.encode()) + rb"=([^;,]*)")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._public.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        token = self._token(scope)
+        if not token:
+            logger.info("Missing access token for %s", scope["path"])
+            await self._unauthorized(scope, receive, send, "Invalid or expired token")
+            return
+
+        try:
+            user = await self.token_cache.get_user(token, self.validate)
+        except Exception as e:
+            logger.error("Authentication error for %s: %s", scope["path"], e)
+            await self._unauthorized(scope, receive, send, "Authentication failed")
+            return
+
+        if not user:
+            logger.info("Token validation failed for %s", scope["path"])
+            await self._unauthorized(scope, receive, send, "Invalid or expired token")
+            return
+
+        scope.setdefault("state", {})["user"] = user
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("User %s authenticated for %s", getattr(user, "id", None), scope["path"])
+        await self.app(scope, receive, send)
+
+    def _token(self, scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                match = self._cookie.search(value)
+                if match:
+                    token = match.group(1).strip(b' "').decode("latin-1")
+                    return token[len(_BEARER_PREFIX):] if token.startswith(_BEARER_PREFIX) else token
+        return None
+
+    @staticmethod
+    async def _unauthorized(scope, receive, send, detail: str):
+        response = JSONResponse(
+            {"detail": detail},
+            status_code=401,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import httpx
+import jwt
+
+logger = logging.getLogger(__name__)
+
+AUTH_LOCAL_VERIFICATION = os.getenv("AUTH_LOCAL_VERIFICATION", "false").lower() in ("1", "true", "yes")
+AUTH_JWKS_URL = os.getenv("AUTH_JWKS_URL")
+# The token signing key, for HS* algorithms only. Not the SDK client secret.
+AUTH_JWT_SECRET = os.getenv("AUTH_JWT_SECRET")
+AUTH_JWT_ALGORITHMS = [name.strip() for name in os.getenv("AUTH_JWT_ALGORITHMS", "RS256").split(",") if name.strip()]
+AUTH_JWT_ISSUER = os.getenv("AUTH_JWT_ISSUER")
+AUTH_JWT_AUDIENCE = os.getenv("AUTH_JWT_AUDIENCE")
+AUTH_JWT_LEEWAY_IN_SECONDS = int(os.getenv("AUTH_JWT_LEEWAY_IN_SECONDS", 30))
+AUTH_JWT_USER_ID_CLAIM = os.getenv("AUTH_JWT_USER_ID_CLAIM", "sub")
+JWKS_CACHE_TTL_IN_SECONDS = int(os.getenv("JWKS_CACHE_TTL_IN_SECONDS", 60 * 60))
+JWKS_MIN_REFRESH_INTERVAL_IN_SECONDS = int(os.getenv("JWKS_MIN_REFRESH_INTERVAL_IN_SECONDS", 30))
+JWKS_FETCH_TIMEOUT_IN_SECONDS = float(os.getenv("JWKS_FETCH_TIMEOUT_IN_SECONDS", 2))
+
+_SYMMETRIC_PREFIX = "HS"
+
+
+class UnverifiableToken(Exception):
+    """The token can be neither accepted nor rejected locally."""
+
+
+class JWKSCache:
+    """Signing keys from a JWKS endpoint by `kid`, refreshed on expiry and on unknown keys.
+
+    A failed refresh keeps the previous keys, so an auth-service outage
+    does not stop verification of tokens signed with known keys.
+    """
+
+    def __init__(self, url: str, ttl: float = JWKS_CACHE_TTL_IN_SECONDS,
+                 min_refresh_interval: float = JWKS_MIN_REFRESH_INTERVAL_IN_SECONDS):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, Any] = {}
+        self._fetched_at = 0.0
+        self._attempted_at = 0.0
+        self._lock = asyncio.Lock()
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    async def get(self, kid: Optional[str]) -> Any:
+        if time.monotonic() - self._fetched_at > self.ttl:
+            await self._refresh()
+        key = self._lookup(kid)
+        if key is None:
+            # A kid we have not seen usually means the keys were rotated.
+            await self._refresh()
+            key = self._lookup(kid)
+        if key is None:
+            raise UnverifiableToken(f"Unknown signing key {kid!r}")
+        return key
+
+    def _lookup(self, kid: Optional[str]) -> Any:
+        if kid is None:
+            return next(iter(self._keys.values())) if len(self._keys) == 1 else None
+        return self._keys.get(kid)
+
+    async def _refresh(self):
+        async with self._lock:
+            if time.monotonic() - self._attempted_at < self.min_refresh_interval:
+                return
+            self._attempted_at = time.monotonic()
+            try:
+                async with httpx.AsyncClient(timeout=JWKS_FETCH_TIMEOUT_IN_SECONDS) as client:
+                    response = await client.get(self.url)
+                    response.raise_for_status()
+                keys = {}
+                for jwk in response.json().get("keys", []):
+                    try:
+                        keys[jwk.get("kid")] = jwt.PyJWK(jwk).key
+                    except jwt.PyJWTError as e:
+                        logger.warning(f"Skipping unusable JWKS key {jwk.get('kid')!r}: {str(e)}")
+                self._keys = keys
+                self._fetched_at = time.monotonic()
+                self.refreshes += 1
+                logger.info(f"Loaded {len(keys)} signing keys from {self.url}")
+            except (httpx.HTTPError, ValueError) as e:
+                self.refresh_failures += 1
+                logger.error(f"Fetching signing keys from {self.url} failed: {str(e)}")
+
+
+class LocalTokenVerifier:
+    """Checks accessToken signatures and claims in-process."""
+
+    def __init__(self, jwks_url: Optional[str] = AUTH_JWKS_URL, secret: Optional[str] = AUTH_JWT_SECRET,
+                 algorithms: List[str] = AUTH_JWT_ALGORITHMS, enabled: bool = AUTH_LOCAL_VERIFICATION):
+        self.algorithms = algorithms
+        self.secret = secret
+        self.jwks = JWKSCache(jwks_url) if jwks_url else None
+        self.enabled = enabled and (self.jwks is not None or bool(secret))
+        self.verified = 0
+        self.rejected = 0
+        self.fallbacks = 0
+
+    async def _key(self, header: dict) -> Any:
+        algorithm = header.get("alg")
+        if algorithm not in self.algorithms:
+            raise UnverifiableToken(f"Algorithm {algorithm!r} is not accepted locally")
+        if algorithm.startswith(_SYMMETRIC_PREFIX):
+            if not self.secret:
+                raise UnverifiableToken("No shared secret configured")
+            return self.secret
+        if self.jwks is None:
+            raise UnverifiableToken("No JWKS endpoint configured")
+        return await self.jwks.get(header.get("kid"))
+
+    async def verify(self, token: str) -> Optional[SimpleNamespace]:
+        """The user for a valid token, None for a token that is definitely invalid.
+
+        Raises UnverifiableToken when only the auth service can decide.
+        """
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError:
+            # Opaque or otherwise non-JWT tokens are for the auth service to judge.
+            raise UnverifiableToken("Token is not a JWT")
+
+        key = await self._key(header)
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=[header["alg"]],
+                audience=AUTH_JWT_AUDIENCE,
+                issuer=AUTH_JWT_ISSUER,
+                leeway=AUTH_JWT_LEEWAY_IN_SECONDS,
+                options={"require": ["exp"], "verify_aud": AUTH_JWT_AUDIENCE is not None},
+            )
+        except jwt.PyJWTError as e:
+            self.rejected += 1
+            logger.debug(f"Local token verification rejected a token: {str(e)}")
+            return None
+
+        if claims.get(AUTH_JWT_USER_ID_CLAIM) is None:
+            raise UnverifiableToken(f"Token has no {AUTH_JWT_USER_ID_CLAIM!r} claim")
+        self.verified += 1
+        return SimpleNamespace(**{**claims, "id": claims[AUTH_JWT_USER_ID_CLAIM]})
+
+    def stats(self) -> dict:
+        stats = {
+            "enabled": self.enabled,
+            "verified": self.verified,
+            "rejected": self.rejected,
+            "fallbacks": self.fallbacks,
+        }
+        if self.jwks is not None:
+            stats["jwks_refreshes"] = self.jwks.refreshes
+            stats["jwks_refresh_failures"] = self.jwks.refresh_failures
+        return stats
@@ -1,108 +1,72 @@
+import asyncio
+import json
 import logging
+import signal
 from pathlib import Path
 
-from fastapi import FastAPI, applications, Request, HTTPException, status
+from fastapi import FastAPI, applications, Request, Response, status
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.staticfiles import StaticFiles
 import os
 from fastapi.middleware.cors import CORSMiddleware
 
-from api.database.database import database
-from api.v1_0.profiles.routes import profile_router
+from api.database.database import engine, get_pool_stats, warm_pool
+from api.database.migrations import run_migrations
+from api.database.purge import soft_delete_purger
+from api.database.replica import replica_engine, replica_monitor
+from api.database.notifications import notification_listener, ENUMERATIONS_CHANNEL, VENDORS_CHANNEL
+from api.v1_0.helpers.response_cache import response_cache, profile_tag, PROFILES_TAG
+from api.v1_0.vendors.active_index import active_vendor_index
+from api.v1_0.vendors.open_now import open_now_engine
+from api.v1_0.profiles.enumeration_tree import enumeration_tree
+from api.v1_0.profiles.routes import profile_router, profiles_representation, get_profiles_representation
 from api.v1_0.vendors.routes import vendor_router
 
+from app.metrics import MetricsMiddleware, METRICS_PATH, gauge_lines, instrument_engine, register_collector
+from app.auth_middleware import AuthMiddleware
+from app.jwt_verifier import LocalTokenVerifier, UnverifiableToken
+from app.token_cache import TokenCache
 from backbone_auth_sdk.auth_sdk import AsyncAuth
-import time
 
-token_cache = {}
-DEFAULT_CACHE_TTL_IN_SECONDS = 365 * 24 * 60 * 60
+token_cache = TokenCache()
+token_verifier = LocalTokenVerifier()
 
 auth = AsyncAuth(
     secret=os.getenv("BASALAM_AUTH_SECRET"),
 )
 
+
+async def validate_token(token: str):
+    # Tokens are checked in-process when local verification is configured;
+    # the auth service only sees the ones we cannot decide on.
+    if token_verifier.enabled:
+        try:
+            return await token_verifier.verify(token)
+        except UnverifiableToken as e:
+            token_verifier.fallbacks += 1
+            logger.debug("Falling back to who_am_i: %s", e)
+    return await auth.who_am_i(token)
+
+
 app = FastAPI(title="QC",
               description="API for QC(q-commerce) project for basalam",
               version="1.0", )
+app.state.ready = False
 
 logger = logging.getLogger(__name__)
 
-
-@app.middleware("http")
-async def auth_middleware(request: Request, call_next):
-    logger.debug(f"Processing request: {request.method} {request.url.path}")
-
-    public_paths = ["/docs", "/redoc", "/openapi.json", "/static"]
-    if any(request.url.path.startswith(path) for path in public_paths):
-        logger.debug(f"Skipping authentication for public path: {request.url.path}")
-        return await call_next(request)
-
-    auth_header = request.cookies.get("accessToken")
-    logger.debug(f"Authorization header: {auth_header}")
-
-    if not auth_header:
-        logger.error(f"Missing Authorization header for {request.url.path}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    token = auth_header.replace("Bearer ", "") if auth_header.startswith("Bearer ") else auth_header
-    cache_key = "who-am-i:" + token
-    logger.debug(f"Processing token: {token}")
-
-    try:
-        current_time = time.time()
-        if cache_key in token_cache:
-            cached_data = token_cache[cache_key]
-            if cached_data["expiry"] > current_time:
-                user = cached_data["user"]
-                logger.debug(f"Cache hit for user: {user.id}")
-            else:
-                logger.debug("Cache expired, removing entry")
-                del token_cache[cache_key]
-                user = None
-        else:
-            logger.debug("No cache entry found")
-            user = None
-
-        if not user:
-            logger.debug("Validating token with auth_sdk")
-            user = await auth.who_am_i(token)
-            if not user:
-                logger.error(f"Token validation failed for {request.url.path}: Invalid or expired token")
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid or expired token",
-                    headers={"WWW-Authenticate": "Bearer"},
-                )
-            logger.debug(f"Token validated, user: {user.id}")
-            token_cache[cache_key] = {
-                "user": user,
-                "expiry": current_time + DEFAULT_CACHE_TTL_IN_SECONDS
-            }
-
-        request.state.user = user
-        logger.debug(f"User {user.id} authenticated for {request.url.path}")
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Authentication error for {request.url.path}: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Authentication failed",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    response = await call_next(request)
-    return response
+# How long /ready answers 503 after SIGTERM before the server starts
+# draining, about one readiness probe period.
+READINESS_DRAIN_DELAY_IN_SECONDS = float(os.getenv("READINESS_DRAIN_DELAY_IN_SECONDS", 5))
 
 
 "Routes will be defined here"
 app.include_router(vendor_router)
 app.include_router(profile_router)
 
+PUBLIC_PATHS = ["/docs", "/redoc", "/openapi.json", "/static", "/live", "/ready", METRICS_PATH]
+app.add_middleware(AuthMiddleware, token_cache=token_cache, validate=validate_token, public_paths=PUBLIC_PATHS)
+
 CORS_ORIGINS = os.getenv("CORS_ORIGINS").split(",")
 app.add_middleware(
     CORSMiddleware,
@@ -111,16 +75,129 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+if replica_engine is not None:
+    instrument_engine(replica_engine)
+
+
+def auth_cache_metrics():
+    stats = token_cache.stats()
+    lookups = stats["hits"] + stats["negative_hits"] + stats["misses"]
+    hit_rate = (stats["hits"] + stats["negative_hits"]) / lookups if lookups else 0
+    return gauge_lines("qc_auth_cache", "Token cache counters.", stats, label="stat") + \
+        gauge_lines("qc_auth_cache_hit_rate", "Share of token lookups answered from the cache.", {"hit_rate": hit_rate})
+
+
+def pool_metrics():
+    stats = get_pool_stats()
+    values = {key: value for key, value in stats.items() if isinstance(value, (int, float))}
+    values["wait_count"] = stats["wait_seconds"]["count"]
+    values["wait_seconds_sum"] = stats["wait_seconds"]["sum"]
+    return gauge_lines("qc_db_pool", "Connection pool state.", values, label="stat")
+
+
+def response_cache_metrics():
+    values = {key: int(value) for key, value in response_cache.stats().items()}
+    return gauge_lines("qc_response_cache", "Response cache counters.", values, label="stat")
+
+
+def token_verifier_metrics():
+    values = {key: int(value) for key, value in token_verifier.stats().items()}
+    return gauge_lines("qc_auth_local_verification", "Local token verification counters.", values, label="stat")
+
+
+register_collector(auth_cache_metrics)
+register_collector(token_verifier_metrics)
+register_collector(pool_metrics)
+register_collector(response_cache_metrics)
+
+
+async def invalidate_profiles(payload: str = None):
+    profiles_representation.invalidate()
+    tags = [PROFILES_TAG]
+    if payload:
+        try:
+            tags.append(profile_tag(json.loads(payload)["id"]))
+        except (ValueError, KeyError, TypeError):
+            pass
+    # Every worker receives the NOTIFY, so there is nothing to publish.
+    await response_cache.invalidate(tags, publish=False)
 
 
 @app.on_event("startup")
 async def startup():
-    await database.connect()
+    await run_migrations()
+    await response_cache.start()
+    notification_listener.subscribe(ENUMERATIONS_CHANNEL, invalidate_profiles)
+    notification_listener.on_reconnect(invalidate_profiles)
+    notification_listener.subscribe(ENUMERATIONS_CHANNEL, enumeration_tree.on_notification)
+    notification_listener.on_reconnect(enumeration_tree.on_notification)
+    enumeration_tree.observers.append(profiles_representation.invalidate)
+    notification_listener.subscribe(VENDORS_CHANNEL, active_vendor_index.on_vendor_notification)
+    notification_listener.subscribe(ENUMERATIONS_CHANNEL, active_vendor_index.on_profile_notification)
+    notification_listener.on_reconnect(active_vendor_index.on_reconnect)
+    active_vendor_index.observers.append(open_now_engine.on_index_change)
+    await notification_listener.start()
+    await warm_pool()
+    if replica_engine is not None:
+        await start_replica()
+    await enumeration_tree.load()
+    await active_vendor_index.load()
+    await open_now_engine.wait_for_cities()
+    soft_delete_purger.start()
+    await warm_caches()
+    drain_on_sigterm()
+    app.state.ready = True
+
+
+def drain_on_sigterm():
+    # The server installs its own SIGTERM handler before startup runs. Wrap it
+    # so the worker first reports unready and only stops accepting connections
+    # once the load balancer had a probe period to take it out of rotation.
+    # A second SIGTERM goes straight through.
+    server_handler = signal.getsignal(signal.SIGTERM)
+    if not callable(server_handler):
+        return
+    loop = asyncio.get_running_loop()
+
+    def handle_sigterm(sig, frame):
+        signal.signal(signal.SIGTERM, server_handler)
+        app.state.ready = False
+        logger.info(f"SIGTERM received, draining in {READINESS_DRAIN_DELAY_IN_SECONDS} seconds")
+        loop.call_soon_threadsafe(loop.call_later, READINESS_DRAIN_DELAY_IN_SECONDS, server_handler, sig, frame)
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+
+async def start_replica():
+    # An unreachable replica must not keep the worker from serving; reads go
+    # to the primary until the monitor finds the replica caught up.
+    try:
+        await warm_pool(replica_engine)
+    except Exception as e:
+        logger.error(f"Replica pool warm-up failed, reading from the primary: {str(e)}")
+    await replica_monitor.check()
+    replica_monitor.start()
+
+
+async def warm_caches():
+    try:
+        await get_profiles_representation()
+        active_vendor_index.get_all_representation()
+    except Exception as e:
+        logger.warning(f"Cache warm-up failed, caches will fill on demand: {str(e)}")
 
 
 @app.on_event("shutdown")
 async def shutdown():
-    await database.disconnect()
+    app.state.ready = False
+    open_now_engine.stop()
+    soft_delete_purger.stop()
+    await notification_listener.stop()
+    await response_cache.stop()
+    await replica_monitor.stop()
+    await engine.dispose()
 
 
 @app.get("/")
@@ -129,6 +206,38 @@ async def root(request: Request):
     return {"message": "QC", "user": user}
 
 
+@app.get("/live")
+async def live():
+    return {"status": "alive"}
+
+
+@app.get("/ready")
+async def ready():
+    if not app.state.ready:
+        return Response(status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return {"status": "ready"}
+
+
+@app.get("/auth-cache/stats")
+async def auth_cache_stats():
+    return {**token_cache.stats(), "local_verification": token_verifier.stats()}
+
+
+@app.get("/pool/stats")
+async def pool_stats():
+    return get_pool_stats()
+
+
+@app.get("/replica/stats")
+async def replica_stats():
+    return replica_monitor.stats()
+
+
+@app.get("/purge/stats")
+async def purge_stats():
+    return soft_delete_purger.stats()
+
+
 @app.get("/hello/{name}")
 async def say_hello(name: str):
     return {"message": f"Hello {name} from QC"}
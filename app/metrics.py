@@ -0,0 +1,194 @@
+import bisect
+import contextvars
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+QUERY_COUNT_BUCKETS = [0, 1, 2, 3, 5, 10, 20, 50, 100]
+QUERY_COUNT_WARN_THRESHOLD = int(os.getenv("QUERY_COUNT_WARN_THRESHOLD", 20))
+METRICS_PATH = "/metrics"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+_request_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "qc_request_stats", default=None
+)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: List[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: Dict[Labels, List] = {}
+
+    def observe(self, labels: Labels, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ["+Inf"], counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {total}"
+            yield f"{self.name}_count{_format_labels(labels)} {count}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, kind: str = "counter"):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self._values: Dict[Labels, float] = defaultdict(float)
+
+    def inc(self, labels: Labels, value: float = 1):
+        self._values[labels] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(labels)} {value}"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{key}="{str(value)}"'.replace("\n", " ") for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+request_latency = Histogram("qc_http_request_duration_seconds", "Request latency by route template.",
+                            LATENCY_BUCKETS)
+request_db_time = Histogram("qc_http_request_db_seconds", "Time spent in SQL statements per request.",
+                            LATENCY_BUCKETS)
+request_queries = Histogram("qc_http_request_queries", "SQL statements issued per request.", QUERY_COUNT_BUCKETS)
+requests_total = Counter("qc_http_requests_total", "Finished requests by route template and status.")
+requests_in_flight = Counter("qc_http_requests_in_flight", "Requests being served.", kind="gauge")
+query_budget_exceeded = Counter(
+    "qc_http_request_query_budget_exceeded_total",
+    f"Requests that issued more than {QUERY_COUNT_WARN_THRESHOLD} SQL statements.",
+)
+
+_METRICS = [request_latency, request_db_time, request_queries, requests_total, requests_in_flight,
+            query_budget_exceeded]
+_collectors: List[Callable[[], Iterable[str]]] = []
+
+
+def register_collector(collector: Callable[[], Iterable[str]]):
+    _collectors.append(collector)
+
+
+def gauge_lines(name: str, help_text: str, values: Dict[str, float], label: Optional[str] = None) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for key, value in values.items():
+        lines.append(f'{name}{{{label}="{key}"}} {value}' if label else f"{name} {value}")
+    return lines
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            lines.extend(collector())
+        except Exception as e:
+            logger.error(f"Metrics collector {collector!r} failed: {str(e)}")
+    return "\n".join(lines) + "\n"
+
+
+def instrument_engine(engine):
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("qc_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["qc_query_started"].pop()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route latency, SQL count and DB time."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if scope["path"] == METRICS_PATH:
+            body = render_metrics().encode()
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/plain; version=0.0.4; charset=utf-8"),
+                            (b"content-length", str(len(body)).encode())],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_code = 500
+        method = scope["method"]
+        in_flight_labels = (("method", method),)
+        requests_in_flight.inc(in_flight_labels)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            requests_in_flight.inc(in_flight_labels, -1)
+            _request_stats.reset(token)
+
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            labels = (("method", method), ("route", template))
+            request_latency.observe(labels, elapsed)
+            request_db_time.observe(labels, stats.db_time)
+            request_queries.observe(labels, stats.queries)
+            requests_total.inc(labels + (("status", str(status_code)),))
+            if stats.queries > QUERY_COUNT_WARN_THRESHOLD:
+                query_budget_exceeded.inc(labels)
+                logger.warning(f"{method} {template} issued {stats.queries} SQL statements "
+                               f"(threshold {QUERY_COUNT_WARN_THRESHOLD}), possible N+1")
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import jwt
+
+from api.v1_0.helpers.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", 50000))
+TOKEN_CACHE_SHARDS = int(os.getenv("TOKEN_CACHE_SHARDS", 16))
+TOKEN_CACHE_DEFAULT_TTL = int(os.getenv("TOKEN_CACHE_DEFAULT_TTL", 15 * 60))
+TOKEN_CACHE_MAX_TTL = int(os.getenv("TOKEN_CACHE_MAX_TTL", 24 * 60 * 60))
+TOKEN_CACHE_NEGATIVE_TTL = int(os.getenv("TOKEN_CACHE_NEGATIVE_TTL", 30))
+
+_REJECTED = object()
+
+
+def token_ttl(token: str, default_ttl: float = TOKEN_CACHE_DEFAULT_TTL,
+              max_ttl: float = TOKEN_CACHE_MAX_TTL) -> float:
+    # The signature is not checked here; who_am_i already accepted the token.
+    try:
+        claims = jwt.decode(token, options={"verify_signature": False})
+        exp = claims.get("exp")
+    except jwt.PyJWTError:
+        exp = None
+
+    if exp is None:
+        return min(default_ttl, max_ttl)
+    return max(0.0, min(float(exp) - time.time(), max_ttl))
+
+
+class TokenCache:
+    """Sharded LRU cache of validated tokens with negative caching and single-flight."""
+
+    def __init__(
+            self,
+            max_size: int = TOKEN_CACHE_MAX_SIZE,
+            shards: int = TOKEN_CACHE_SHARDS,
+            negative_ttl: float = TOKEN_CACHE_NEGATIVE_TTL,
+    ):
+        shards = max(1, shards)
+        shard_size = max(1, max_size // shards)
+        self._shards = [TTLCache(shard_size, TOKEN_CACHE_DEFAULT_TTL) for _ in range(shards)]
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.negative_ttl = negative_ttl
+        self.negative_hits = 0
+        self.coalesced = 0
+
+    def _shard(self, token: str) -> TTLCache:
+        return self._shards[hash(token) % len(self._shards)]
+
+    async def get_user(self, token: str, validate: Callable[[str], Awaitable[Any]]) -> Optional[Any]:
+        # Concurrent misses for one token share a single `validate` call; its
+        # exceptions reach every waiter and are never cached.
+        cached = self._shard(token).get(token)
+        if cached is _REJECTED:
+            self.negative_hits += 1
+            return None
+        if cached is not None:
+            return cached
+
+        future = self._inflight.get(token)
+        if future is None:
+            future = asyncio.ensure_future(self._validate(token, validate))
+            self._inflight[token] = future
+            future.add_done_callback(lambda _: self._inflight.pop(token, None))
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(future)
+
+    async def _validate(self, token: str, validate: Callable[[str], Awaitable[Any]]) -> Optional[Any]:
+        user = await validate(token)
+        if user:
+            self._shard(token).set(token, user, ttl=token_ttl(token))
+            return user
+
+        self._shard(token).set(token, _REJECTED, ttl=self.negative_ttl)
+        return None
+
+    def invalidate(self, token: str):
+        self._shard(token).pop(token)
+
+    def clear(self):
+        for shard in self._shards:
+            shard.clear()
+
+    def stats(self) -> dict:
+        shard_stats = [shard.stats() for shard in self._shards]
+        hits = sum(s["hits"] for s in shard_stats)
+        misses = sum(s["misses"] for s in shard_stats)
+        return {
+            "size": sum(s["size"] for s in shard_stats),
+            "max_size": sum(s["max_size"] for s in shard_stats),
+            "shards": len(self._shards),
+            "hits": hits - self.negative_hits,
+            "negative_hits": self.negative_hits,
+            "misses": misses,
+            "evictions": sum(s["evictions"] for s in shard_stats),
+            "expirations": sum(s["expirations"] for s in shard_stats),
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
@@ -0,0 +1,164 @@
+"""Capture the SQL behind every read route, EXPLAIN it and fail on plan regressions.
+
+    python -m benchmarks.seed --vendor-infos 1000000
+    python -m benchmarks.explain --output benchmarks/baselines/plans.json
+    python -m benchmarks.explain --compare benchmarks/baselines/plans.json
+
+The same checks run as pytest tests in benchmarks/test_explain.py.
+
+The app is driven in-process without its startup hooks, so the in-memory
+indexes stay empty and every route takes its database path. A statement
+fails when its plan sequentially scans a table outside --allow-seq-scan,
+costs more than --max-cost, or (with --compare) costs more than the
+baseline by more than --threshold.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+from typing import Dict, Iterable, List, Optional, Set
+
+import asyncpg
+import httpx
+from sqlalchemy import event
+
+from api.database.database import DATABASE_URL, engine
+from api.database.migrations import run_migrations
+from benchmarks.run import SCENARIOS, load_sample
+from benchmarks.server import who_am_i_stub
+
+# Tables small enough that a sequential scan is the right plan.
+DEFAULT_ALLOWED_SEQ_SCANS = ["enumerations", "city_vendor_stats", "schema_migrations"]
+# Scans a route needs by design, e.g. the exact count behind the vendor list.
+ROUTE_ALLOWED_SEQ_SCANS: Dict[str, Set[str]] = {
+    "GET /v1/vendors/": {"vendor_infos"},
+}
+READ_PREFIXES = ("SELECT", "WITH")
+
+
+class StatementRecorder:
+    def __init__(self):
+        self.statements: List[tuple] = []
+        self.recording = False
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.recording and not executemany and statement.lstrip().upper().startswith(READ_PREFIXES):
+            self.statements.append((statement, tuple(parameters or ())))
+
+
+def _walk(plan: dict) -> Iterable[dict]:
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from _walk(child)
+
+
+async def explain(connection: asyncpg.Connection, statement: str, parameters: tuple) -> dict:
+    result = await connection.fetchval(f"EXPLAIN (FORMAT JSON) {statement}", *parameters)
+    plan = json.loads(result)[0]["Plan"]
+    return {
+        "cost": plan["Total Cost"],
+        "seq_scans": sorted({node["Relation Name"] for node in _walk(plan) if node["Node Type"] == "Seq Scan"}),
+        "nodes": sorted({node["Node Type"] for node in _walk(plan)}),
+    }
+
+
+async def capture(seed: int) -> Dict[str, List[dict]]:
+    import app.main
+
+    app.main.auth.who_am_i = who_am_i_stub
+    recorder = StatementRecorder()
+    event.listen(engine.sync_engine, "before_cursor_execute", recorder)
+
+    await run_migrations()
+    sample = await load_sample()
+    rng = random.Random(seed)
+    connection = await asyncpg.connect(DATABASE_URL.replace("+asyncpg", ""))
+    transport = httpx.ASGITransport(app=app.main.app)
+    try:
+        plans = await _capture_scenarios(transport, connection, recorder, sample, rng)
+    finally:
+        await connection.close()
+        event.remove(engine.sync_engine, "before_cursor_execute", recorder)
+        await engine.dispose()
+    return plans
+
+
+async def _capture_scenarios(transport: httpx.ASGITransport, connection: asyncpg.Connection,
+                             recorder: StatementRecorder, sample: dict, rng: random.Random) -> Dict[str, List[dict]]:
+    plans: Dict[str, List[dict]] = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://explain",
+                                 cookies={"accessToken": "benchmark"}, timeout=120) as client:
+        for scenario in SCENARIOS:
+            if scenario.destructive:
+                continue
+            request = scenario.build(rng, sample)
+            url = request.pop("url")
+            recorder.statements = []
+            recorder.recording = True
+            try:
+                response = await client.request(scenario.method, url, **request)
+            finally:
+                recorder.recording = False
+
+            seen = set()
+            for statement, parameters in recorder.statements:
+                if statement in seen:
+                    continue
+                seen.add(statement)
+                summary = await explain(connection, statement, parameters)
+                summary["sql"] = " ".join(statement.split())
+                plans.setdefault(scenario.name, []).append(summary)
+            print(f"{scenario.name:60} {response.status_code}  {len(seen)} statements")
+    return plans
+
+
+def check(plans: Dict[str, List[dict]], allowed_seq_scans: Set[str], max_cost: float,
+          baseline: Optional[dict], threshold: float) -> List[str]:
+    failures = []
+    for route, summaries in plans.items():
+        allowed = allowed_seq_scans | ROUTE_ALLOWED_SEQ_SCANS.get(route, set())
+        base_costs = {summary["sql"]: summary["cost"] for summary in (baseline or {}).get(route, ())}
+        for summary in summaries:
+            sql = summary["sql"][:120]
+            for relation in summary["seq_scans"]:
+                if relation not in allowed:
+                    failures.append(f"{route}: sequential scan on {relation} in {sql}")
+            if summary["cost"] > max_cost:
+                failures.append(f"{route}: cost {summary['cost']:.0f} over budget {max_cost:.0f} in {sql}")
+            base_cost = base_costs.get(summary["sql"])
+            if base_cost and summary["cost"] > base_cost * (1 + threshold):
+                failures.append(f"{route}: cost {base_cost:.0f} -> {summary['cost']:.0f} in {sql}")
+    return failures
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--allow-seq-scan", nargs="*", default=DEFAULT_ALLOWED_SEQ_SCANS)
+    parser.add_argument("--max-cost", type=float, default=50000, help="planner cost budget per statement")
+    parser.add_argument("--output", help="write the captured plans as JSON, e.g. a new baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare costs against")
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed relative cost increase")
+    args = parser.parse_args(argv)
+
+    plans = asyncio.run(capture(args.seed))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(plans, output, indent=2, ensure_ascii=False)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    failures = check(plans, set(args.allow_seq_scan), args.max_cost, baseline, args.threshold)
+    for failure in failures:
+        print(f"PLAN REGRESSION {failure}")
+    if failures:
+        sys.exit(1)
+    print("All plans within budget")
+
+
+if __name__ == "__main__":
+    main()
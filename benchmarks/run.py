@@ -0,0 +1,280 @@
+"""Load-test every vendor and profile route and compare against a stored baseline.
+
+    python -m benchmarks.seed --vendor-infos 1000000
+    python -m benchmarks.run --output benchmarks/baselines/main.json
+    python -m benchmarks.run --compare benchmarks/baselines/main.json --threshold 0.15
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import asyncpg
+import httpx
+
+from api.database.database import DATABASE_URL
+
+DEFAULT_CONCURRENCY = [1, 16, 64]
+
+
+class Scenario:
+    def __init__(self, method: str, route: str, build: Callable[[random.Random, dict], dict],
+                 destructive: bool = False):
+        self.method = method
+        self.route = route
+        self.build = build
+        self.destructive = destructive
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.route}"
+
+
+def _vendor_payload(rng: random.Random, sample: dict) -> dict:
+    vendor_id = rng.randint(10 ** 8, 2 * 10 ** 8)
+    return {
+        "vendor_identifier": vendor_id,
+        "vendor_name_persian": "غرفه بنچمارک",
+        "vendor_name_english": f"bench-{vendor_id}",
+        "phone_number_of_owner": "09120000000",
+        "is_active": True,
+        "the_number_of_purchase": 1,
+        "the_number_of_products": 1,
+        "the_number_of_sold_products": 1,
+    }
+
+
+SCENARIOS = [
+    Scenario("GET", "/v1/profiles/", lambda rng, s: {"url": "/v1/profiles/"}),
+    Scenario("GET", "/v1/vendors/", lambda rng, s: {
+        "url": "/v1/vendors/", "params": {"limit": 100, "offset": rng.randint(0, 10000)}}),
+    Scenario("GET", "/v1/vendors/{vendor_id}", lambda rng, s: {
+        "url": f"/v1/vendors/{rng.choice(s['vendor_ids'])}"}),
+    Scenario("GET", "/v1/vendors/search", lambda rng, s: {
+        "url": "/v1/vendors/search", "params": {"vendor_name": rng.choice(s["words"]), "limit": 20}}),
+    Scenario("GET", "/v1/vendors/search?mode=prefix", lambda rng, s: {
+        "url": "/v1/vendors/search", "params": {"vendor_name": rng.choice(s["words"])[:2], "mode": "prefix"}}),
+    Scenario("GET", "/v1/vendors/city/{city_id}", lambda rng, s: {
+        "url": f"/v1/vendors/city/{rng.choice(s['city_ids'])}", "params": {"limit": 50}}),
+    Scenario("GET", "/v1/vendors/city/{city_id}/stats", lambda rng, s: {
+        "url": f"/v1/vendors/city/{rng.choice(s['city_ids'])}/stats"}),
+    Scenario("GET", "/v1/vendors/city-stats", lambda rng, s: {"url": "/v1/vendors/city-stats"}),
+    Scenario("GET", "/v1/vendors/export", lambda rng, s: {
+        "url": "/v1/vendors/export", "params": {"city_id": rng.choice(s["city_ids"]), "format": "ndjson"}}),
+    Scenario("GET", "/v1/vendors/active-qc-vendor-list", lambda rng, s: {"url": "/v1/vendors/active-qc-vendor-list"}),
+    Scenario("GET", "/v1/vendors/active-qc-vendor-single", lambda rng, s: {
+        "url": "/v1/vendors/active-qc-vendor-single",
+        "params": {"id": rng.choice(s["active_vendor_ids"]), "source": "vendor"}}),
+    Scenario("GET", "/v1/vendors/open-now", lambda rng, s: {"url": "/v1/vendors/open-now"}),
+    Scenario("POST", "/v1/vendors/add-to-qc", lambda rng, s: {
+        "url": "/v1/vendors/add-to-qc", "json": _vendor_payload(rng, s)}, destructive=True),
+    Scenario("POST", "/v1/vendors/add-multiple-vendor-to-qc", lambda rng, s: {
+        "url": "/v1/vendors/add-multiple-vendor-to-qc",
+        "json": [_vendor_payload(rng, s) for _ in range(100)]}, destructive=True),
+    Scenario("PUT", "/v1/vendors/update-qc-vendor/{vendor_id}", lambda rng, s: {
+        "url": f"/v1/vendors/update-qc-vendor/{rng.choice(s['vendor_ids'])}",
+        "json": {**_vendor_payload(rng, s), "vendor_identifier": None}}, destructive=True),
+    Scenario("PUT", "/v1/vendors/update-multiple-qc-vendor", lambda rng, s: {
+        "url": "/v1/vendors/update-multiple-qc-vendor",
+        "json": [{**_vendor_payload(rng, s), "vendor_identifier": rng.choice(s["vendor_ids"])}
+                 for _ in range(100)]}, destructive=True),
+    Scenario("DELETE", "/v1/vendors/delete-qc-vendor/{vendor_id}", lambda rng, s: {
+        "url": f"/v1/vendors/delete-qc-vendor/{rng.choice(s['vendor_ids'])}"}, destructive=True),
+    Scenario("DELETE", "/v1/vendors/delete-multiple-qc-vendor", lambda rng, s: {
+        "url": "/v1/vendors/delete-multiple-qc-vendor",
+        "json": rng.sample(s["vendor_ids"], min(50, len(s["vendor_ids"])))}, destructive=True),
+]
+
+
+async def load_sample(size: int = 2000) -> dict:
+    connection = await asyncpg.connect(DATABASE_URL.replace("+asyncpg", ""))
+    try:
+        vendor_ids = [row[0] for row in await connection.fetch(
+            "SELECT vendor_id FROM vendor_infos TABLESAMPLE SYSTEM (1) LIMIT $1", size)]
+        city_ids = [row[0] for row in await connection.fetch(
+            "SELECT DISTINCT city_id FROM vendor_infos TABLESAMPLE SYSTEM (1) WHERE city_id IS NOT NULL LIMIT $1",
+            size)]
+        active_vendor_ids = [row[0] for row in await connection.fetch(
+            "SELECT vendor_id FROM vendors WHERE status = 2 LIMIT $1", size)]
+        names = await connection.fetch(
+            "SELECT vendor_english_name, vendor_persian_name FROM vendor_infos TABLESAMPLE SYSTEM (1) LIMIT 200")
+    finally:
+        await connection.close()
+
+    words = sorted({word for row in names for name in row if name for word in name.split() if len(word) > 2})
+    return {
+        "vendor_ids": vendor_ids or [1],
+        "city_ids": city_ids or [1],
+        "active_vendor_ids": active_vendor_ids or [1],
+        "words": words or ["shop"],
+    }
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(percentile / 100 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(rank, len(sorted_values) - 1))]
+
+
+async def drive(client: httpx.AsyncClient, scenario: Scenario, sample: dict, concurrency: int,
+                duration: float, warmup: float, seed: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    status_codes: Dict[int, int] = {}
+
+    async def worker(worker_id: int, deadline: float, record: bool):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.perf_counter() < deadline:
+            request = scenario.build(rng, sample)
+            url = request.pop("url")
+            started = time.perf_counter()
+            try:
+                response = await client.request(scenario.method, url, **request)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            elapsed = time.perf_counter() - started
+            if record:
+                latencies.append(elapsed)
+                status_codes[status] = status_codes.get(status, 0) + 1
+                if not 200 <= status < 300:
+                    errors += 1
+
+    if warmup > 0:
+        deadline = time.perf_counter() + warmup
+        await asyncio.gather(*(worker(index, deadline, False) for index in range(concurrency)))
+
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(worker(index, deadline, True) for index in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "status_codes": {str(code): count for code, count in sorted(status_codes.items())},
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+
+async def wait_until_up(base_url: str, timeout: float = 120):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                response = await client.get("/openapi.json")
+                if response.status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} did not come up within {timeout}s")
+
+
+async def run(args) -> dict:
+    base_url = args.base_url or f"http://127.0.0.1:{args.port}"
+    server = None
+    if not args.base_url:
+        server = subprocess.Popen([sys.executable, "-m", "benchmarks.server", "--port", str(args.port)])
+    try:
+        await wait_until_up(base_url)
+        sample = await load_sample()
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if (args.include_writes or not scenario.destructive)
+            and (not args.routes or scenario.name in args.routes)
+        ]
+
+        results: Dict[str, Dict[str, dict]] = {}
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=base_url, cookies={"accessToken": "benchmark"}, limits=limits,
+                                     timeout=60) as client:
+            for scenario in scenarios:
+                for concurrency in args.concurrency:
+                    result = await drive(client, scenario, sample, concurrency, args.duration, args.warmup,
+                                         args.seed)
+                    results.setdefault(scenario.name, {})[f"c={concurrency}"] = result
+                    print(f"{scenario.name:60} c={concurrency:<4} {result['throughput_rps']:9.1f} rps  "
+                          f"p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}  p99 {result['p99_ms']:8.2f} ms"
+                          f"  errors {result['errors']}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    regressions = []
+    for route, levels in current["results"].items():
+        for level, result in levels.items():
+            base = baseline.get("results", {}).get(route, {}).get(level)
+            if not base:
+                continue
+            if base["p95_ms"] and result["p95_ms"] > base["p95_ms"] * (1 + threshold):
+                regressions.append(f"{route} {level}: p95 {base['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms")
+            if base["throughput_rps"] and result["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+                regressions.append(f"{route} {level}: throughput {base['throughput_rps']:.1f} -> "
+                                   f"{result['throughput_rps']:.1f} rps")
+            if result["errors"] > base["errors"]:
+                regressions.append(f"{route} {level}: errors {base['errors']} -> {result['errors']}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="benchmark an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--duration", type=float, default=10, help="measured seconds per route and level")
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--routes", nargs="*", help='only these scenarios, e.g. "GET /v1/profiles/"')
+    parser.add_argument("--include-writes", action="store_true", help="also drive the routes that modify data")
+    parser.add_argument("--output", help="write the results as JSON, e.g. a new baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    current = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(current, output, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(current, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
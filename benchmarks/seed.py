@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import asyncpg
+
+from api.database.database import DATABASE_URL, init_db
+from api.database.migrations import run_migrations
+import api.v1_0.vendors.models  # noqa: F401  registers the tables on Base
+
+PERSIAN_WORDS = ["فروشگاه", "غرفه", "بازارچه", "خانه", "هنر", "سوغات", "کتاب", "گل", "نان", "عسل", "چای",
+                 "ادویه", "پارچه", "سفال", "چرم", "شیرینی", "محلی", "ایرانی", "تازه", "طلایی"]
+ENGLISH_WORDS = ["shop", "store", "bazaar", "home", "art", "gift", "book", "flower", "bread", "honey", "tea",
+                 "spice", "fabric", "pottery", "leather", "sweets", "local", "persian", "fresh", "golden"]
+CHUNK_SIZE = 50000
+PROFILES_PARENT_ID = 5
+
+
+def _name(rng: random.Random, words, minimum: int) -> str:
+    name = " ".join(rng.choice(words) for _ in range(rng.randint(2, 4)))
+    return name if len(name) >= minimum else name + " " + rng.choice(words)
+
+
+def _working_times(rng: random.Random):
+    opens = rng.choice(["08:00", "09:00", "10:00"])
+    closes = rng.choice(["18:00", "21:00", "23:30", "01:00"])
+    return [{"day": day, "start": opens, "end": closes} for day in range(7) if rng.random() > 0.1]
+
+
+def _vendor_info_rows(rng: random.Random, count: int, cities: int):
+    for index in range(count):
+        city_id = rng.randint(1, cities)
+        yield (
+            index + 1,
+            _name(rng, PERSIAN_WORDS, 6),
+            _name(rng, ENGLISH_WORDS, 3),
+            "09" + "".join(rng.choice("0123456789") for _ in range(9)),
+            rng.random() > 0.2,
+            rng.randint(0, 5000),
+            rng.randint(0, 800),
+            rng.randint(0, 20000),
+            rng.randint(0, 1000),
+            f"https://basalam.com/vendor-{index + 1}",
+            f"city-{city_id}",
+            city_id,
+            rng.randint(1, 10 ** 7),
+        )
+
+
+async def _copy(connection, table: str, columns, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            await connection.copy_records_to_table(table, records=chunk, columns=columns)
+            chunk = []
+    if chunk:
+        await connection.copy_records_to_table(table, records=chunk, columns=columns)
+
+
+async def seed(vendor_infos: int, enumerations: int, vendors: int, cities: int, random_seed: int):
+    await init_db()
+    await run_migrations()
+    rng = random.Random(random_seed)
+
+    connection = await asyncpg.connect(DATABASE_URL.replace("+asyncpg", ""))
+    try:
+        started = time.perf_counter()
+        await connection.execute("TRUNCATE vendors, vendor_infos, enumerations RESTART IDENTITY CASCADE")
+
+        enumeration_rows = [(index, None, f"root-{index}", None, True) for index in range(1, PROFILES_PARENT_ID + 1)]
+        for index in range(PROFILES_PARENT_ID + 1, enumerations + 1):
+            parent_id = PROFILES_PARENT_ID if rng.random() < 0.3 else rng.randint(1, index - 1)
+            enumeration_rows.append((index, parent_id, _name(rng, PERSIAN_WORDS, 3),
+                                     json.dumps({"icon": f"icon-{index}"}), rng.random() > 0.1))
+        await _copy(connection, "enumerations", ["id", "parent_id", "title", "extra", "status"], enumeration_rows)
+        await connection.execute("SELECT setval('enumerations_id_seq', (SELECT max(id) FROM enumerations))")
+        profile_ids = [row[0] for row in enumeration_rows if row[1] == PROFILES_PARENT_ID]
+
+        await _copy(
+            connection,
+            "vendor_infos",
+            ["vendor_id", "vendor_persian_name", "vendor_english_name", "vendor_phone_number", "is_active",
+             "purchase_count", "products_count", "sold_products", "same_city_orders", "vendor_url", "city_name",
+             "city_id", "user_id"],
+            _vendor_info_rows(rng, vendor_infos, cities),
+        )
+
+        vendor_rows = (
+            (rng.randint(1, vendor_infos), rng.choice(profile_ids), json.dumps(_working_times(rng)),
+             json.dumps({"min_order": rng.randint(0, 500000)}), 2 if rng.random() < 0.8 else 1)
+            for _ in range(vendors)
+        )
+        await _copy(connection, "vendors", ["vendor_id", "profile_id", "working_times", "extra", "status"],
+                    vendor_rows)
+
+        await connection.execute("ANALYZE enumerations, vendors, vendor_infos")
+        print(f"Seeded {vendor_infos} vendor_infos, {enumerations} enumerations and {vendors} vendors "
+              f"in {time.perf_counter() - started:.1f}s")
+    finally:
+        await connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill the configured database with a synthetic QC dataset")
+    parser.add_argument("--vendor-infos", type=int, default=1_000_000)
+    parser.add_argument("--enumerations", type=int, default=2_000)
+    parser.add_argument("--vendors", type=int, default=5_000)
+    parser.add_argument("--cities", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(seed(args.vendor_infos, args.enumerations, args.vendors, args.cities, args.seed))
+
+
+if __name__ == "__main__":
+    main()
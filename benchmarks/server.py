@@ -0,0 +1,26 @@
+import argparse
+from types import SimpleNamespace
+
+import uvicorn
+
+BENCHMARK_USER = SimpleNamespace(id=1, name="benchmark")
+
+
+async def who_am_i_stub(token: str):
+    return BENCHMARK_USER
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run app.main:app with AsyncAuth.who_am_i stubbed out")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    import app.main
+
+    app.main.auth.who_am_i = who_am_i_stub
+    uvicorn.run(app.main.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""EXPLAIN the SQL behind every read route and fail on plan regressions.
+
+    python -m benchmarks.seed --vendor-infos 1000000
+    DATABASE_HOST=localhost python -m pytest benchmarks/test_explain.py
+    EXPLAIN_BASELINE=benchmarks/baselines/plans.json python -m pytest benchmarks/test_explain.py
+
+Skipped unless DATABASE_HOST is set. New baselines are written with
+python -m benchmarks.explain --output benchmarks/baselines/plans.json.
+"""
+import json
+import os
+
+import pytest
+
+if not os.getenv("DATABASE_HOST"):
+    pytest.skip("DATABASE_HOST is not set", allow_module_level=True)
+
+import asyncio
+
+from benchmarks.explain import DEFAULT_ALLOWED_SEQ_SCANS, capture, check
+from benchmarks.run import SCENARIOS
+
+EXPLAIN_SEED = int(os.getenv("EXPLAIN_SEED", 1))
+EXPLAIN_MAX_COST = float(os.getenv("EXPLAIN_MAX_COST", 50000))
+EXPLAIN_THRESHOLD = float(os.getenv("EXPLAIN_THRESHOLD", 0.5))
+EXPLAIN_BASELINE = os.getenv("EXPLAIN_BASELINE")
+
+READ_ROUTES = [scenario.name for scenario in SCENARIOS if not scenario.destructive]
+
+
+@pytest.fixture(scope="module")
+def plans():
+    return asyncio.run(capture(EXPLAIN_SEED))
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    if not EXPLAIN_BASELINE:
+        return None
+    with open(EXPLAIN_BASELINE) as baseline_file:
+        return json.load(baseline_file)
+
+
+@pytest.mark.parametrize("route", READ_ROUTES)
+def test_plans_within_budget(plans, baseline, route):
+    # Routes served from memory, such as open-now, run no statements.
+    failures = check({route: plans.get(route, [])}, set(DEFAULT_ALLOWED_SEQ_SCANS), EXPLAIN_MAX_COST,
+                     baseline, EXPLAIN_THRESHOLD)
+    assert not failures, "\n".join(failures)
@@ -0,0 +1,55 @@
+import logging
+import os
+
+import uvicorn
+
+from api.database.configs import POOL_SIZE, MAX_OVERFLOW
+
+logger = logging.getLogger(__name__)
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 80))
+KEEP_ALIVE_TIMEOUT_IN_SECONDS = int(os.getenv("KEEP_ALIVE_TIMEOUT_IN_SECONDS", 5))
+GRACEFUL_SHUTDOWN_TIMEOUT_IN_SECONDS = int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT_IN_SECONDS", 30))
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+ACCESS_LOG = os.getenv("ACCESS_LOG", "false").lower() in ("1", "true", "yes")
+
+
+def worker_count() -> int:
+    configured = os.getenv("WEB_CONCURRENCY")
+    if configured:
+        return max(int(configured), 1)
+    try:
+        # CPUs this process may run on, which respects container limits
+        # set through cpusets.
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def main():
+    workers = worker_count()
+    logging.basicConfig(level=logging.INFO)
+    logger.info(f"Starting {workers} workers on {HOST}:{PORT}, up to "
+                f"{workers * (POOL_SIZE + MAX_OVERFLOW)} database connections in total")
+
+    # On SIGTERM each worker reports unready for READINESS_DRAIN_DELAY_IN_SECONDS,
+    # then stops accepting connections, waits up to the graceful timeout for
+    # in-flight requests and runs the app shutdown.
+    uvicorn.run(
+        "app.main:app",
+        host=HOST,
+        port=PORT,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+        timeout_keep_alive=KEEP_ALIVE_TIMEOUT_IN_SECONDS,
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_TIMEOUT_IN_SECONDS,
+        access_log=ACCESS_LOG,
+    )
+
+
+if __name__ == "__main__":
+    main()